@@ -0,0 +1,99 @@
+"""Локальная замена Telegram Bot API для бенчмарков.
+
+Отвечает на методы, которые вызывает бот, правдоподобными объектами
+и считает вызовы и принятые байты.
+"""
+
+import itertools
+import json
+import time
+from collections import Counter
+
+from aiohttp import web
+
+BOT_USER = {
+    "id": 100000,
+    "is_bot": True,
+    "first_name": "Bench",
+    "username": "bench_bot",
+}
+
+
+class FakeBotAPI:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.runner = None
+        self.calls = Counter()
+        self.uploaded_bytes = 0
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def reset(self):
+        self.calls.clear()
+        self.uploaded_bytes = 0
+
+    def _message(self, chat_id, **fields):
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": BOT_USER,
+            **fields,
+        }
+
+    def _file(self, **fields):
+        file_number = next(self._file_ids)
+        return {
+            "file_id": f"file-{file_number}",
+            "file_unique_id": f"unique-{file_number}",
+            **fields,
+        }
+
+    async def _handler(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+
+        form = await request.post()
+        for value in form.values():
+            if isinstance(value, web.FileField):
+                self.uploaded_bytes += len(value.file.read())
+
+        chat_id = form.get("chat_id", 0)
+        caption = form.get("caption")
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "sendMessage":
+            result = self._message(chat_id, text=form.get("text", ""))
+        elif method == "sendPhoto":
+            photo = self._file(width=320, height=180)
+            result = self._message(chat_id, photo=[photo], caption=caption)
+        elif method == "sendVideo":
+            video = self._file(width=720, height=1280, duration=15)
+            result = self._message(chat_id, video=video, caption=caption)
+        else:
+            # editMessage*, deleteMessage, answerCallbackQuery, answerInlineQuery...
+            result = True
+
+        return web.Response(
+            text=json.dumps({"ok": True, "result": result}),
+            content_type="application/json",
+        )
+
+    async def start(self):
+        app = web.Application(client_max_size=1024**3)
+        app.router.add_post("/bot{token}/{method}", self._handler)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
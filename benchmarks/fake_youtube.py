@@ -0,0 +1,155 @@
+"""Локальная замена YouTube для бенчмарков.
+
+MediaServer раздаёт сгенерированные файлы по HTTP, а FakeYoutubeDL повторяет
+ту часть интерфейса yt_dlp.YoutubeDL, которой пользуется YouTubeDownloader:
+extract_info(download=False), download(), outtmpl, progress/postprocessor hooks.
+"""
+
+import os
+import re
+import time
+import urllib.request
+
+from aiohttp import web
+
+VIDEO_ID_PATTERN = re.compile(r"(?:shorts/|youtu\.be/|[?&]v=)([\w-]{11})")
+
+
+class MediaServer:
+    """HTTP-сервер с синтетическими видео и превью"""
+
+    def __init__(self, media_size: int, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        # Один буфер на все видео: нас интересует передача байтов, не содержимое
+        self.media = os.urandom(media_size)
+        self.thumbnail = os.urandom(16 * 1024)
+        self.runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _media_handler(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.media, content_type="video/mp4")
+
+    async def _thumbnail_handler(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.thumbnail, content_type="image/jpeg")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/media/{name}", self._media_handler)
+        app.router.add_get("/thumb/{name}", self._thumbnail_handler)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+
+def make_fake_youtube_dl(server: MediaServer, extract_delay: float = 0.0):
+    """Класс-заменитель yt_dlp.YoutubeDL, работающий с MediaServer"""
+
+    class FakeYoutubeDL:
+        def __init__(self, params=None):
+            self.params = params or {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def extract_info(self, url, download=True):
+            # Имитация сетевой задержки extract_info
+            if extract_delay:
+                time.sleep(extract_delay)
+
+            match = VIDEO_ID_PATTERN.search(url)
+            video_id = match.group(1) if match else "unknownvid0"
+            media_url = f"{server.base_url}/media/{video_id}"
+
+            info = {
+                "id": video_id,
+                "title": f"Benchmark video {video_id}",
+                "thumbnail": f"{server.base_url}/thumb/{video_id}.jpg",
+                "duration": 15,
+                "formats": [
+                    {
+                        "format_id": "18",
+                        "height": 360,
+                        "vcodec": "avc1",
+                        "acodec": "mp4a",
+                        "ext": "mp4",
+                        "url": media_url,
+                    },
+                    {
+                        "format_id": "135",
+                        "height": 480,
+                        "vcodec": "avc1",
+                        "acodec": "none",
+                        "ext": "mp4",
+                        "url": media_url,
+                    },
+                    {
+                        "format_id": "136",
+                        "height": 720,
+                        "vcodec": "avc1",
+                        "acodec": "none",
+                        "ext": "mp4",
+                        "url": media_url,
+                    },
+                    {
+                        "format_id": "140",
+                        "vcodec": "none",
+                        "acodec": "mp4a",
+                        "ext": "m4a",
+                        "url": media_url,
+                    },
+                ],
+            }
+
+            if download:
+                self._download(info)
+            return info
+
+        def download(self, urls):
+            for url in urls:
+                self.extract_info(url, download=True)
+            return 0
+
+        def _download(self, info):
+            output_path = self.params.get("outtmpl")
+            if isinstance(output_path, dict):
+                output_path = output_path.get("default")
+
+            hooks = self.params.get("progress_hooks", [])
+            with urllib.request.urlopen(info["formats"][0]["url"]) as response:
+                total = int(response.headers.get("Content-Length", 0))
+                downloaded = 0
+                with open(output_path, "wb") as file:
+                    while True:
+                        chunk = response.read(256 * 1024)
+                        if not chunk:
+                            break
+                        file.write(chunk)
+                        downloaded += len(chunk)
+                        for hook in hooks:
+                            hook(
+                                {
+                                    "status": "downloading",
+                                    "downloaded_bytes": downloaded,
+                                    "total_bytes": total,
+                                    "speed": None,
+                                    "eta": None,
+                                }
+                            )
+
+            for hook in hooks:
+                hook({"status": "finished", "filename": output_path})
+
+    return FakeYoutubeDL
@@ -0,0 +1,209 @@
+"""Бенчмарк памяти кэша информации о видео.
+
+Заполняет общий кэш YouTubeDownloader (info_cache) записями, собранными из
+синтетических ответов extract_info, похожих на YouTube Shorts (два десятка
+форматов с полным набором ключей yt-dlp), и считает байты на видео через
+tracemalloc. Для сравнения — сколько занимал бы сам ответ yt-dlp.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.memory --videos 100000 --output bench_memory.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.run import REPO_ROOT
+
+# (высота, vcodec, acodec, кбит/с): типичный набор форматов шортса,
+# включая раскадровки (mhtml без видео и звука)
+FORMATS = [
+    (45, "none", "none", 0),
+    (90, "none", "none", 0),
+    (180, "none", "none", 0),
+    (144, "avc1.4d400c", "none", 80),
+    (144, "vp09.00.11.08", "none", 70),
+    (144, "av01.0.00M.08", "none", 60),
+    (240, "avc1.4d4015", "none", 170),
+    (240, "vp09.00.20.08", "none", 150),
+    (240, "av01.0.00M.08", "none", 130),
+    (360, "avc1.4d401e", "none", 330),
+    (360, "vp09.00.21.08", "none", 290),
+    (360, "av01.0.01M.08", "none", 250),
+    (360, "avc1.42001E", "mp4a.40.2", 500),
+    (480, "avc1.4d401f", "none", 620),
+    (480, "vp09.00.30.08", "none", 540),
+    (480, "av01.0.04M.08", "none", 470),
+    (720, "avc1.64001F", "none", 1250),
+    (720, "vp09.00.31.08", "none", 1100),
+    (720, "av01.0.05M.08", "none", 950),
+    (1080, "avc1.640028", "none", 2500),
+    (1080, "vp09.00.40.08", "none", 2200),
+    (1080, "av01.0.08M.08", "none", 1900),
+    (None, "none", "mp4a.40.5", 48),
+    (None, "none", "mp4a.40.2", 129),
+    (None, "none", "opus", 55),
+    (None, "none", "opus", 70),
+    (None, "none", "opus", 135),
+]
+
+
+def fresh(text: str) -> str:
+    # Как после разбора JSON: у каждого ответа свои объекты строк
+    return "".join(list(text))
+
+
+def make_info(index: int) -> dict:
+    """Ответ extract_info(download=False) для одного видео"""
+    rng = random.Random(index)
+    video_id = f"{index:011d}"[-11:]
+    duration = rng.randint(8, 60)
+    base_url = "https://rr1---sn-abcdef.googlevideo.com/videoplayback?" + "&".join(
+        f"k{i}={rng.getrandbits(64):x}" for i in range(24)
+    )
+
+    formats = []
+    for number, (height, vcodec, acodec, tbr) in enumerate(FORMATS):
+        if vcodec == acodec == "none":
+            ext = "mhtml"
+        else:
+            ext = "m4a" if height is None else "mp4"
+        formats.append(
+            {
+                "format_id": str(100 + number),
+                "format_note": f"{height}p" if height else "medium",
+                "ext": ext,
+                "protocol": "https",
+                "vcodec": fresh(vcodec),
+                "acodec": fresh(acodec),
+                "url": f"{base_url}&itag={100 + number}",
+                "width": height * 9 // 16 if height else None,
+                "height": height,
+                "fps": 30 if height else None,
+                "tbr": tbr + rng.random(),
+                "vbr": tbr if height else 0,
+                "abr": 0 if height else tbr,
+                "asr": None if height else 48000,
+                "audio_channels": None if height else 2,
+                "filesize": rng.randint(100_000, 20_000_000),
+                "container": "mp4_dash",
+                "dynamic_range": "SDR" if height else None,
+                "quality": float(number),
+                "has_drm": False,
+                "source_preference": -1,
+                "language": None,
+                "resolution": (
+                    f"{height * 9 // 16}x{height}" if height else "audio only"
+                ),
+                "aspect_ratio": 0.56 if height else None,
+                "video_ext": "mp4" if height else "none",
+                "audio_ext": "none" if height else "m4a",
+                "format": f"{100 + number} - {height}p",
+                "http_headers": {
+                    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) Chrome/120.0",
+                    "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+                    "Accept-Language": "en-us,en;q=0.5",
+                    "Sec-Fetch-Mode": "navigate",
+                },
+                "downloader_options": {"http_chunk_size": 10485760},
+            }
+        )
+
+    return {
+        "id": video_id,
+        "title": f"Видео {index}: " + "очень смешной шортс " * rng.randint(1, 3),
+        "thumbnail": f"https://i.ytimg.com/vi/{video_id}/oar2.jpg?sqp={index:x}",
+        "duration": duration,
+        "formats": formats,
+        "thumbnails": [
+            {"url": f"https://i.ytimg.com/vi/{video_id}/{n}.jpg", "preference": -n}
+            for n in range(20)
+        ],
+        "description": "#shorts " * rng.randint(5, 40),
+        "tags": [f"tag{n}" for n in range(rng.randint(0, 15))],
+        "view_count": rng.randint(0, 10**7),
+        "channel": "Benchmark channel",
+        "upload_date": "20240101",
+    }
+
+
+def measure(build, count: int) -> float:
+    """Прирост памяти на один элемент, байт"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument(
+        "--raw-videos", type=int, default=1000, help="ответов yt-dlp для сравнения"
+    )
+    parser.add_argument("--output", default="bench_memory.json")
+    args = parser.parse_args()
+    output = Path(args.output).resolve()
+
+    # Конфиг читается при импорте: кэш должен вместить все записи
+    os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+    os.environ["INFO_CACHE_SIZE"] = str(args.videos)
+    os.chdir(tempfile.mkdtemp(prefix="shorts-memory-"))
+    sys.path.insert(0, str(REPO_ROOT))
+
+    from bot.services.youtube import YouTubeDownloader, make_video_info
+
+    service = YouTubeDownloader("downloads")
+    # Кодеки попадают в общую таблицу при первом видео — не считаем её
+    make_video_info("https://youtube.com/shorts/warmupvideo", make_info(-1))
+
+    def fill_cache(count):
+        for index in range(count):
+            info = make_info(index)
+            url = f"https://youtube.com/shorts/{info['id']}"
+            service.remember_video_info(make_video_info(url, info))
+        return service.info_cache
+
+    def keep_raw(count):
+        return [make_info(index) for index in range(count)]
+
+    started = time.perf_counter()
+    compact = measure(fill_cache, args.videos)
+    fill_seconds = time.perf_counter() - started
+    raw = measure(keep_raw, args.raw_videos)
+
+    sample = next(iter(service.info_cache.values()))[1]
+    summary = {
+        "videos": len(service.info_cache),
+        "formats_per_video": len(FORMATS),
+        "formats_kept_per_video": len(sample.formats),
+        "bytes_per_video": round(compact),
+        "raw_info_bytes_per_video": round(raw),
+        "raw_to_compact_ratio": round(raw / compact, 1),
+        "videos_per_100mb": int(100 * 1024 * 1024 / compact),
+        "fill_us_per_video_traced": round(fill_seconds / args.videos * 1e6, 1),
+    }
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "summary": summary,
+    }
+
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    print(f"Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Офлайн-бенчмарк бота.
+
+yt-dlp заменяется локальным фейковым экстрактором (benchmarks/fake_youtube.py),
+Telegram — локальным Bot API (benchmarks/fake_telegram.py). Синтетические апдейты
+прогоняются через настоящий Dispatcher и роутеры из main.create_dispatcher().
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.run --users 50 --output bench_results.json
+
+Результаты (пропускная способность, p50/p95/p99, память) пишутся в JSON,
+чтобы сравнивать прогоны между собой.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+ADMIN_ID = 1
+
+# Окружение нужно подготовить до импорта модулей бота: config читает его при импорте
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ["ADMIN_IDS"] = str(ADMIN_ID)
+# Общие лимиты частоты не должны искажать замер пропускной способности
+os.environ.setdefault("THROTTLE_GLOBAL_METADATA", "100000:100000")
+os.environ.setdefault("THROTTLE_GLOBAL_DOWNLOAD", "100000:100000")
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        "count": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies_ms, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies_ms, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies_ms, 0.99), 2) if latencies else None,
+    }
+
+
+def max_rss_mb() -> float:
+    # На Linux ru_maxrss в килобайтах, на macOS — в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform != "darwin" else rss / (1024 * 1024)
+
+
+class UpdateFactory:
+    """Синтетические апдейты Telegram"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.update_id = 0
+        self.message_id = 0
+
+    def _next_ids(self):
+        self.update_id += 1
+        self.message_id += 1
+        return self.update_id, self.message_id
+
+    @staticmethod
+    def _user(user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def message(self, user_id, text):
+        from aiogram.types import Update
+
+        update_id, message_id = self._next_ids()
+        return Update.model_validate(
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": self._user(user_id),
+                    "text": text,
+                },
+            },
+            context={"bot": self.bot},
+        )
+
+    def callback(self, user_id, data):
+        from aiogram.types import Update
+
+        update_id, message_id = self._next_ids()
+        return Update.model_validate(
+            {
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "from": self._user(user_id),
+                    "chat_instance": str(user_id),
+                    "data": data,
+                    "message": {
+                        "message_id": message_id,
+                        "date": int(time.time()),
+                        "chat": {"id": user_id, "type": "private"},
+                        "text": "preview",
+                    },
+                },
+            },
+            context={"bot": self.bot},
+        )
+
+
+async def timed_feed(dp, bot, update):
+    started = time.perf_counter()
+    await dp.feed_update(bot, update)
+    return time.perf_counter() - started
+
+
+async def bench_download_burst(dp, bot, factory, users, resolution):
+    """Все пользователи одновременно присылают ссылку и выбирают разрешение"""
+
+    async def user_flow(user_id):
+        video_id = f"{user_id:011d}"[-11:]
+        started = time.perf_counter()
+        await dp.feed_update(
+            bot, factory.message(user_id, f"https://youtube.com/shorts/{video_id}")
+        )
+        await dp.feed_update(bot, factory.callback(user_id, f"resolution:{resolution}"))
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(
+        *(user_flow(10_000 + user_id) for user_id in range(users))
+    )
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def bench_broadcast(dp, bot, factory, api):
+    """Полный сценарий текстовой рассылки от администратора"""
+    api.reset()
+    started = time.perf_counter()
+
+    for update in (
+        factory.callback(ADMIN_ID, "admin:broadcast"),
+        factory.callback(ADMIN_ID, "broadcast:type:text"),
+        factory.message(ADMIN_ID, "Benchmark broadcast"),
+        factory.callback(ADMIN_ID, "broadcast:confirm"),
+    ):
+        await dp.feed_update(bot, update)
+
+    elapsed = time.perf_counter() - started
+    sent = api.calls["sendMessage"]
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "messages_sent": sent,
+        "send_rate_per_s": round(sent / elapsed, 2) if elapsed else None,
+    }
+
+
+async def bench_admin_queries(dp, bot, factory, queries):
+    latencies = []
+    started = time.perf_counter()
+
+    for i in range(queries):
+        update = (
+            factory.message(ADMIN_ID, "/admin")
+            if i % 2 == 0
+            else factory.callback(ADMIN_ID, "admin:stats")
+        )
+        latencies.append(await timed_feed(dp, bot, update))
+
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def seed_database(users, downloads_per_user):
+    from bot.database.models import get_connection
+
+    conn = get_connection()
+    conn.executemany(
+        "INSERT OR IGNORE INTO users (user_id, first_name) VALUES (?, ?)",
+        ((100_000 + i, f"Seed{i}") for i in range(users)),
+    )
+    conn.executemany(
+        "INSERT INTO downloads (user_id, video_url, resolution) VALUES (?, ?, ?)",
+        (
+            (100_000 + i, f"https://youtube.com/shorts/seed{j:07d}", "720")
+            for i in range(users)
+            for j in range(downloads_per_user)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run(args):
+    workdir = Path(tempfile.mkdtemp(prefix="shorts-bench-"))
+    # downloads/ и база создаются относительно рабочей директории
+    os.chdir(workdir)
+
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import yt_dlp
+
+    from benchmarks.fake_telegram import FakeBotAPI
+    from benchmarks.fake_youtube import MediaServer, make_fake_youtube_dl
+    from bot.database import models
+
+    models.DATABASE_PATH = workdir / "bench.db"
+    models.init_db()
+
+    media_server = MediaServer(media_size=args.media_size_kb * 1024)
+    await media_server.start()
+    api = FakeBotAPI()
+    await api.start()
+
+    yt_dlp.YoutubeDL = make_fake_youtube_dl(media_server, args.extract_delay)
+
+    from main import create_dispatcher
+
+    dp = create_dispatcher()
+    bot = Bot(
+        token=os.environ["BOT_TOKEN"],
+        session=AiohttpSession(api=TelegramAPIServer.from_base(api.base_url)),
+    )
+    factory = UpdateFactory(bot)
+    # Сервисы создаются в startup-хендлерах, как при start_polling
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    results = {}
+    try:
+        results["download_burst"] = await bench_download_burst(
+            dp, bot, factory, args.users, args.resolution
+        )
+        results["download_burst"]["uploaded_mb"] = round(
+            api.uploaded_bytes / (1024 * 1024), 2
+        )
+
+        seed_database(args.broadcast_users, args.downloads_per_user)
+        results["broadcast"] = await bench_broadcast(dp, bot, factory, api)
+        results["admin_queries"] = await bench_admin_queries(
+            dp, bot, factory, args.admin_queries
+        )
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        await api.stop()
+        await media_server.stop()
+
+    memory = {"max_rss_mb": round(max_rss_mb(), 1)}
+    if args.trace_memory:
+        memory["tracemalloc_peak_mb"] = round(
+            tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1
+        )
+        tracemalloc.stop()
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "memory": memory,
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=50, help="пользователей в пике")
+    parser.add_argument("--resolution", default="720")
+    parser.add_argument("--media-size-kb", type=int, default=2048)
+    parser.add_argument("--extract-delay", type=float, default=0.05)
+    parser.add_argument("--broadcast-users", type=int, default=100)
+    parser.add_argument("--downloads-per-user", type=int, default=5)
+    parser.add_argument("--admin-queries", type=int, default=200)
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve()
+    report = asyncio.run(run(args))
+
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(json.dumps(report["scenarios"], indent=2, ensure_ascii=False))
+    print(f"Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
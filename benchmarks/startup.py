@@ -0,0 +1,110 @@
+"""Бенчмарк холодного старта бота.
+
+Каждый прогон — отдельный процесс: импорт main, сборка диспетчера,
+startup-хендлеры (создание сервисов) и первое обращение к yt-dlp.
+Замеряются время этапов и RSS после каждого из них.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.startup --runs 5 --output bench_startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.run import REPO_ROOT, max_rss_mb
+
+
+def child():
+    """Один холодный старт; результат — JSON в stdout"""
+    os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+    os.chdir(tempfile.mkdtemp(prefix="shorts-startup-"))
+    sys.path.insert(0, str(REPO_ROOT))
+    result = {}
+
+    started = time.perf_counter()
+    import main
+    from bot.database import models
+
+    dp = main.create_dispatcher()
+    result["import_s"] = time.perf_counter() - started
+    result["import_rss_mb"] = max_rss_mb()
+
+    models.DATABASE_PATH = Path("startup.db")
+    models.init_db()
+
+    started = time.perf_counter()
+    asyncio.run(dp.emit_startup(bot=None, dispatcher=dp))
+    result["startup_s"] = time.perf_counter() - started
+    result["startup_rss_mb"] = max_rss_mb()
+    result["yt_dlp_loaded_at_startup"] = "yt_dlp" in sys.modules
+
+    # Первое обращение к YouTube: импорт yt-dlp и создание YoutubeDL
+    started = time.perf_counter()
+    import yt_dlp
+
+    from bot.services.sources import KNOWN_SOURCES
+
+    opts = dp["youtube_service"]._get_ydl_opts()
+    yt_dlp.YoutubeDL({**opts, **KNOWN_SOURCES["youtube"].ydl_opts})
+    result["first_ydl_s"] = time.perf_counter() - started
+    result["first_ydl_rss_mb"] = max_rss_mb()
+
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default="bench_startup.json")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    # Медиана по прогонам: первый обычно медленнее из-за холодного кэша ФС
+    summary = {
+        key: (
+            round(statistics.median(run[key] for run in runs), 4)
+            if isinstance(runs[0][key], float)
+            else runs[0][key]
+        )
+        for key in runs[0]
+    }
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "runs": runs,
+        "median": summary,
+    }
+
+    output = Path(args.output).resolve()
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    print(f"Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
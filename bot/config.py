@@ -4,10 +4,136 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _rate_limit(name: str, default: str):
+    """Лимит вида "токенов_в_секунду:пачка", например "0.2:3" """
+    rate, burst = os.getenv(name, default).split(":")
+    return float(rate), int(burst)
+
+
+def _per_source(name: str, default: str):
+    """Значения по источникам вида "youtube:4,tiktok:2" """
+    pairs = (item.split(":") for item in os.getenv(name, default).split(",") if item)
+    return {source: float(value) for source, value in pairs}
+
+
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x]
 DATABASE_PATH = "bot_database.db"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Эндпоинт метрик Prometheus (0 — выключен)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
 DOWNLOAD_DIR = "downloads"
+# Лимит медиа-кэша скачанных видео (downloads/cache), старые файлы вытесняются
+MEDIA_CACHE_MAX_MB = int(os.getenv("MEDIA_CACHE_MAX_MB", "2048"))
+
+# Служебный чат, куда бот загружает видео для inline-режима (нужен file_id)
+STORAGE_CHAT_ID = int(os.getenv("STORAGE_CHAT_ID", "0")) or None
+INLINE_RESOLUTION = os.getenv("INLINE_RESOLUTION", "720")
+
+# Спекулятивная предзагрузка после показа превью: off | history | always
+PREFETCH_POLICY = os.getenv("PREFETCH_POLICY", "off")
+PREFETCH_DEFAULT_RESOLUTION = os.getenv("PREFETCH_DEFAULT_RESOLUTION", "720")
+# Минимальная доля разрешения в истории пользователя, чтобы на него ставить
+PREFETCH_MIN_SHARE = float(os.getenv("PREFETCH_MIN_SHARE", "0.6"))
+PREFETCH_MAX_CONCURRENT = int(os.getenv("PREFETCH_MAX_CONCURRENT", "2"))
+
+# Как часто обновлять сообщение с прогрессом (у Telegram лимит на редактирование)
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "3"))
+
+# Ограничение частоты запросов (на пользователя и общее на весь бот)
+THROTTLE_MESSAGE = _rate_limit("THROTTLE_MESSAGE", "1:5")
+THROTTLE_METADATA = _rate_limit("THROTTLE_METADATA", "0.2:3")
+THROTTLE_DOWNLOAD = _rate_limit("THROTTLE_DOWNLOAD", "0.1:3")
+THROTTLE_GLOBAL_METADATA = _rate_limit("THROTTLE_GLOBAL_METADATA", "10:30")
+THROTTLE_GLOBAL_DOWNLOAD = _rate_limit("THROTTLE_GLOBAL_DOWNLOAD", "4:10")
+
+# Очередь скачиваний: число одновременных загрузок и полосы приоритета
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+SHORT_VIDEO_SECONDS = int(os.getenv("SHORT_VIDEO_SECONDS", "60"))
+HEAVY_VIDEO_SECONDS = int(os.getenv("HEAVY_VIDEO_SECONDS", "180"))
+HEAVY_VIDEO_MB = int(os.getenv("HEAVY_VIDEO_MB", "50"))
+# Каждые LANE_AGING_SECONDS ожидания задача поднимается на полосу выше
+LANE_AGING_SECONDS = float(os.getenv("LANE_AGING_SECONDS", "30"))
+
+# Выключатель (свой у каждой площадки): после серии 403/429 в окне перестаём
+# ходить на площадку на BREAKER_BASE_BACKOFF секунд (растёт вдвое при повторных
+# срабатываниях)
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_MIN_FAILURES = int(os.getenv("BREAKER_MIN_FAILURES", "5"))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_BASE_BACKOFF = float(os.getenv("BREAKER_BASE_BACKOFF", "30"))
+BREAKER_MAX_BACKOFF = float(os.getenv("BREAKER_MAX_BACKOFF", "900"))
+# Несколько файлов cookies / исходящих IP через запятую: при блокировке одного
+# набора запросы идут через следующий
+COOKIE_FILES = [path for path in os.getenv("COOKIE_FILES", "").split(",") if path]
+SOURCE_ADDRESSES = [
+    address for address in os.getenv("SOURCE_ADDRESSES", "").split(",") if address
+]
+
+# Предельное время этапов обработки, секунды
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "30"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "300"))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "300"))
+# Сколько yt-dlp ждёт данных от зависшего соединения
+YTDLP_SOCKET_TIMEOUT = float(os.getenv("YTDLP_SOCKET_TIMEOUT", "20"))
+
+# Площадки, ссылки на которые принимает бот (bot/services/sources.py)
+ENABLED_SOURCES = [
+    name
+    for name in os.getenv("ENABLED_SOURCES", "youtube,tiktok,instagram,vk").split(",")
+    if name
+]
+# Одновременные загрузки с одной площадки (не больше DOWNLOAD_WORKERS)
+SOURCE_MAX_CONCURRENT = _per_source(
+    "SOURCE_MAX_CONCURRENT", "youtube:4,tiktok:2,instagram:1,vk:2"
+)
+# Начальный backoff выключателя по площадкам; остальным — BREAKER_BASE_BACKOFF.
+# Instagram банит за частые запросы надолго, поэтому ждём дольше
+SOURCE_BASE_BACKOFF = _per_source("SOURCE_BASE_BACKOFF", "tiktok:60,instagram:120")
+
+# GIF-анимации: первые ANIMATION_MAX_SECONDS секунд видео, без звука
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+ANIMATION_MAX_SECONDS = int(os.getenv("ANIMATION_MAX_SECONDS", "15"))
+ANIMATION_HEIGHT = int(os.getenv("ANIMATION_HEIGHT", "360"))
+ANIMATION_FPS = int(os.getenv("ANIMATION_FPS", "15"))
+
+# Общий кэш информации о видео (без ссылок на файлы, поэтому живёт долго)
+INFO_CACHE_SECONDS = float(os.getenv("INFO_CACHE_SECONDS", "3600"))
+INFO_CACHE_SIZE = int(os.getenv("INFO_CACHE_SIZE", "5000"))
+# Telegram file_id отправленных видео и превью: столько последних в памяти,
+# остальные видео ищутся в истории загрузок
+FILE_ID_CACHE_SIZE = int(os.getenv("FILE_ID_CACHE_SIZE", "20000"))
+
+# Прогрев популярного: раз в WARMER_INTERVAL секунд (0 — выключен) берём видео,
+# которые скачивали не меньше WARMER_MIN_REQUESTS раз за WARMER_WINDOW_HOURS
+WARMER_INTERVAL = float(os.getenv("WARMER_INTERVAL", "300"))
+WARMER_WINDOW_HOURS = int(os.getenv("WARMER_WINDOW_HOURS", "24"))
+WARMER_MIN_REQUESTS = int(os.getenv("WARMER_MIN_REQUESTS", "3"))
+WARMER_TOP = int(os.getenv("WARMER_TOP", "20"))
+# Заранее скачивать и сами файлы (с STORAGE_CHAT_ID — сразу получать file_id)
+WARMER_MEDIA = os.getenv("WARMER_MEDIA", "1") == "1"
+# Бюджет прогрева: трафик в час и доля времени, которую он может занимать
+WARMER_MAX_MB_PER_HOUR = float(os.getenv("WARMER_MAX_MB_PER_HOUR", "500"))
+WARMER_TIME_SHARE = float(os.getenv("WARMER_TIME_SHARE", "0.25"))
+
+# Записей на странице /history
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "8"))
+
+# Сколько ждать идущие загрузки и рассылки при остановке (SIGTERM), секунды.
+# Не успевшие задачи сохраняются и продолжаются после перезапуска
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "25"))
+
+# Защита от перегрузки: сколько апдейтов обрабатывается одновременно и сколько
+# может ждать. Бот перегружен, если в очереди скачиваний больше
+# OVERLOAD_QUEUE_DEPTH задач или цикл событий отстаёт больше OVERLOAD_LOOP_LAG
+# секунд: тогда новые сообщения ждут (с ответом "вы №N в очереди"),
+# а inline-запросы отбрасываются
+MAX_IN_FLIGHT_UPDATES = int(os.getenv("MAX_IN_FLIGHT_UPDATES", "100"))
+MAX_WAITING_UPDATES = int(os.getenv("MAX_WAITING_UPDATES", "500"))
+OVERLOAD_QUEUE_DEPTH = int(os.getenv("OVERLOAD_QUEUE_DEPTH", "20"))
+OVERLOAD_LOOP_LAG = float(os.getenv("OVERLOAD_LOOP_LAG", "0.5"))
 
 if not BOT_TOKEN:
     raise ValueError("❌ BOT_TOKEN not found in .env file!")
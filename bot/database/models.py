@@ -1,8 +1,11 @@
+import logging
 import sqlite3
 from pathlib import Path
 
 DATABASE_PATH = Path(__file__).parent.parent.parent / "bot_database.db"
 
+logger = logging.getLogger(__name__)
+
 
 def get_connection():
     conn = sqlite3.connect(DATABASE_PATH)
@@ -30,11 +33,250 @@ def init_db():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER,
             video_url TEXT,
+            resolution TEXT,
+            video_id TEXT,
+            title TEXT,
+            file_id TEXT,
             downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )
     """)
 
+    # Миграция старых баз: колонки для истории (/history) появились позже
+    columns = [row["name"] for row in cursor.execute("PRAGMA table_info(downloads)")]
+    for column in ("resolution", "video_id", "title", "file_id"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE downloads ADD COLUMN {column} TEXT")
+
+    # Страницы /history: WHERE user_id = ? AND id < ? ORDER BY id DESC
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_downloads_user
+        ON downloads (user_id, id)
+    """)
+
+    # Популярные видео за последние часы (CacheWarmer)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_downloads_time
+        ON downloads (downloaded_at)
+    """)
+
+    # Поиск уже загруженного в Telegram файла; строки без file_id не нужны
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_downloads_file_id
+        ON downloads (video_id, resolution, id)
+        WHERE file_id IS NOT NULL
+    """)
+
+    # Незавершённые при остановке задачи, продолжаются после перезапуска
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pending_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    _init_rollups(cursor)
+
     conn.commit()
     conn.close()
-    print("✅ База данных инициализирована")
+    logger.info("База данных инициализирована")
+
+
+def _init_rollups(cursor):
+    """Сводные таблицы для аналитики в админке.
+
+    Счётчики обновляются триггерами при каждой записи в downloads и users,
+    поэтому запросы аналитики читают десятки строк сводок, а не downloads.
+    Время — UTC (CURRENT_TIMESTAMP в SQLite).
+    """
+    created = not _table_exists(cursor, "stats_daily")
+    # Счётчик пользователей появился позже остальных сводок
+    totals_created = not _table_exists(cursor, "stats_totals")
+
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS stats_hourly (
+            hour TEXT PRIMARY KEY,
+            downloads INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT PRIMARY KEY,
+            downloads INTEGER NOT NULL DEFAULT 0,
+            active_users INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS stats_monthly (
+            month TEXT PRIMARY KEY,
+            downloads INTEGER NOT NULL DEFAULT 0,
+            active_users INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS stats_videos (
+            video_key TEXT PRIMARY KEY,
+            video_url TEXT,
+            title TEXT,
+            downloads INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_stats_videos_downloads
+        ON stats_videos (downloads);
+        CREATE TABLE IF NOT EXISTS stats_resolutions (
+            resolution TEXT PRIMARY KEY,
+            downloads INTEGER NOT NULL DEFAULT 0
+        );
+        -- Итоги по всей базе: name = 'users' — всего пользователей
+        CREATE TABLE IF NOT EXISTS stats_totals (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        );
+
+        -- Кто был активен в день/месяц: вставка новой пары увеличивает DAU/MAU
+        CREATE TABLE IF NOT EXISTS active_days (
+            day TEXT,
+            user_id INTEGER,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS active_months (
+            month TEXT,
+            user_id INTEGER,
+            PRIMARY KEY (month, user_id)
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS active_days_rollup
+        AFTER INSERT ON active_days
+        BEGIN
+            INSERT INTO stats_daily (day, active_users) VALUES (NEW.day, 1)
+            ON CONFLICT (day) DO UPDATE SET active_users = active_users + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS active_months_rollup
+        AFTER INSERT ON active_months
+        BEGIN
+            INSERT INTO stats_monthly (month, active_users) VALUES (NEW.month, 1)
+            ON CONFLICT (month) DO UPDATE SET active_users = active_users + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS downloads_rollup
+        AFTER INSERT ON downloads
+        BEGIN
+            INSERT INTO stats_hourly (hour, downloads)
+            VALUES (strftime('%Y-%m-%d %H:00', NEW.downloaded_at), 1)
+            ON CONFLICT (hour) DO UPDATE SET downloads = downloads + 1;
+
+            INSERT INTO stats_daily (day, downloads)
+            VALUES (date(NEW.downloaded_at), 1)
+            ON CONFLICT (day) DO UPDATE SET downloads = downloads + 1;
+
+            INSERT INTO stats_monthly (month, downloads)
+            VALUES (strftime('%Y-%m', NEW.downloaded_at), 1)
+            ON CONFLICT (month) DO UPDATE SET downloads = downloads + 1;
+
+            INSERT INTO stats_videos (video_key, video_url, title, downloads)
+            VALUES (COALESCE(NEW.video_id, NEW.video_url), NEW.video_url, NEW.title, 1)
+            ON CONFLICT (video_key) DO UPDATE SET
+                downloads = downloads + 1,
+                title = COALESCE(excluded.title, title);
+
+            INSERT INTO stats_resolutions (resolution, downloads)
+            VALUES (COALESCE(NEW.resolution, '?'), 1)
+            ON CONFLICT (resolution) DO UPDATE SET downloads = downloads + 1;
+
+            INSERT OR IGNORE INTO active_days VALUES
+                (date(NEW.downloaded_at), NEW.user_id);
+            INSERT OR IGNORE INTO active_months VALUES
+                (strftime('%Y-%m', NEW.downloaded_at), NEW.user_id);
+        END;
+
+        -- add_user — UPSERT: повторный визит вызывает UPDATE, а не INSERT
+        CREATE TRIGGER IF NOT EXISTS users_count_insert
+        AFTER INSERT ON users
+        BEGIN
+            INSERT INTO stats_totals (name, value) VALUES ('users', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS users_count_delete
+        AFTER DELETE ON users
+        BEGIN
+            UPDATE stats_totals SET value = value - 1 WHERE name = 'users';
+        END;
+
+        -- last_seen обновляется на каждое сообщение, но в сводки попадает
+        -- только первое за день
+        CREATE TRIGGER IF NOT EXISTS users_activity_insert
+        AFTER INSERT ON users
+        BEGIN
+            INSERT OR IGNORE INTO active_days VALUES
+                (date(NEW.last_seen), NEW.user_id);
+            INSERT OR IGNORE INTO active_months VALUES
+                (strftime('%Y-%m', NEW.last_seen), NEW.user_id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS users_activity_update
+        AFTER UPDATE OF last_seen ON users
+        WHEN date(NEW.last_seen) IS NOT date(OLD.last_seen)
+        BEGIN
+            INSERT OR IGNORE INTO active_days VALUES
+                (date(NEW.last_seen), NEW.user_id);
+            INSERT OR IGNORE INTO active_months VALUES
+                (strftime('%Y-%m', NEW.last_seen), NEW.user_id);
+        END;
+    """)
+
+    if created:
+        _backfill_rollups(cursor)
+    if totals_created:
+        cursor.execute("""
+            INSERT INTO stats_totals (name, value)
+            SELECT 'users', COUNT(*) FROM users WHERE true
+            ON CONFLICT (name) DO UPDATE SET value = excluded.value
+        """)
+
+
+def _table_exists(cursor, name: str) -> bool:
+    return bool(
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone()
+    )
+
+
+def _backfill_rollups(cursor):
+    """Однократно заполнить сводки по уже накопленным данным"""
+    logger.info("Заполняем сводные таблицы статистики по истории загрузок")
+
+    # WHERE true нужен SQLite, чтобы отличить ON CONFLICT от JOIN ... ON
+    cursor.executescript("""
+        INSERT INTO stats_hourly (hour, downloads)
+        SELECT strftime('%Y-%m-%d %H:00', downloaded_at), COUNT(*)
+        FROM downloads WHERE true GROUP BY 1
+        ON CONFLICT (hour) DO UPDATE SET downloads = excluded.downloads;
+
+        INSERT INTO stats_daily (day, downloads)
+        SELECT date(downloaded_at), COUNT(*)
+        FROM downloads WHERE true GROUP BY 1
+        ON CONFLICT (day) DO UPDATE SET downloads = excluded.downloads;
+
+        INSERT INTO stats_monthly (month, downloads)
+        SELECT strftime('%Y-%m', downloaded_at), COUNT(*)
+        FROM downloads WHERE true GROUP BY 1
+        ON CONFLICT (month) DO UPDATE SET downloads = excluded.downloads;
+
+        INSERT INTO stats_videos (video_key, video_url, title, downloads)
+        SELECT COALESCE(video_id, video_url), MAX(video_url), MAX(title), COUNT(*)
+        FROM downloads WHERE true GROUP BY 1
+        ON CONFLICT (video_key) DO UPDATE SET downloads = excluded.downloads;
+
+        INSERT INTO stats_resolutions (resolution, downloads)
+        SELECT COALESCE(resolution, '?'), COUNT(*)
+        FROM downloads WHERE true GROUP BY 1
+        ON CONFLICT (resolution) DO UPDATE SET downloads = excluded.downloads;
+
+        -- Активность: триггеры active_* досчитают DAU/MAU
+        INSERT OR IGNORE INTO active_days
+        SELECT DISTINCT date(downloaded_at), user_id FROM downloads;
+        INSERT OR IGNORE INTO active_days
+        SELECT date(last_seen), user_id FROM users;
+        INSERT OR IGNORE INTO active_months
+        SELECT DISTINCT strftime('%Y-%m', downloaded_at), user_id FROM downloads;
+        INSERT OR IGNORE INTO active_months
+        SELECT strftime('%Y-%m', last_seen), user_id FROM users;
+    """)
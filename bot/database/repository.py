@@ -1,8 +1,14 @@
 from datetime import datetime
 
+from bot.services.metrics import timed_query
+
 from .models import get_connection
 
+# Больше любого id в SQLite: первая страница истории — "старее бесконечности"
+MAX_ROWID = 2**63 - 1
+
 
+@timed_query
 def add_user(
     user_id: int, username: str = None, first_name: str = None, last_name: str = None
 ):
@@ -26,6 +32,7 @@ def add_user(
     conn.close()
 
 
+@timed_query
 def get_all_users():
     conn = get_connection()
     cursor = conn.cursor()
@@ -37,6 +44,20 @@ def get_all_users():
     return users
 
 
+@timed_query
+def get_users_after(user_id: int):
+    """Пользователи с user_id больше заданного, по возрастанию user_id"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM users WHERE user_id > ? ORDER BY user_id", (user_id,))
+    users = cursor.fetchall()
+
+    conn.close()
+    return users
+
+
+@timed_query
 def update_last_seen(user_id: int):
     conn = get_connection()
     cursor = conn.cursor()
@@ -54,39 +75,357 @@ def update_last_seen(user_id: int):
     conn.close()
 
 
+@timed_query
 def get_user_count():
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT COUNT(*) FROM users")
+    # Счётчик из сводки вместо COUNT(*) по всей таблице users
+    cursor.execute(
+        "SELECT COALESCE(MAX(value), 0) FROM stats_totals WHERE name = 'users'"
+    )
     count = cursor.fetchone()[0]
 
     conn.close()
     return count
 
 
-def add_download_stat(user_id: int, video_url: str):
+@timed_query
+def add_download_stat(
+    user_id: int,
+    video_url: str,
+    resolution: str = None,
+    video_id: str = None,
+    title: str = None,
+    file_id: str = None,
+) -> int:
+    """Записать загрузку в историю; возвращает id записи"""
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
         """
-        INSERT INTO downloads (user_id, video_url)
-        VALUES (?, ?)
+        INSERT INTO downloads (user_id, video_url, resolution, video_id, title, file_id)
+        VALUES (?, ?, ?, ?, ?, ?)
     """,
-        (user_id, video_url),
+        (user_id, video_url, resolution, video_id, title, file_id),
     )
+    download_id = cursor.lastrowid
 
     conn.commit()
     conn.close()
+    return download_id
+
+
+@timed_query
+def set_download_file_id(download_id: int, file_id: str):
+    """Запомнить file_id файла, отправленного пользователю"""
+    conn = get_connection()
+    cursor = conn.cursor()
 
+    cursor.execute(
+        "UPDATE downloads SET file_id = ? WHERE id = ?", (file_id, download_id)
+    )
 
+    conn.commit()
+    conn.close()
+
+
+@timed_query
+def find_file_id(video_id: str, resolution: str):
+    """Последний file_id этого видео в этом формате, отправленный любому пользователю"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT file_id FROM downloads
+        WHERE video_id = ? AND resolution = ? AND file_id IS NOT NULL
+        ORDER BY id DESC
+        LIMIT 1
+    """,
+        (video_id, resolution),
+    )
+    row = cursor.fetchone()
+
+    conn.close()
+    return row["file_id"] if row else None
+
+
+@timed_query
+def get_hot_videos(window_hours: int, min_requests: int, limit: int):
+    """Чаще всего скачиваемые видео и форматы за последние window_hours часов"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT video_id, MAX(video_url) AS video_url, resolution,
+               COUNT(*) AS requests
+        FROM downloads
+        WHERE downloaded_at >= datetime('now', ?) AND video_id IS NOT NULL
+        GROUP BY video_id, resolution
+        HAVING requests >= ?
+        ORDER BY requests DESC
+        LIMIT ?
+    """,
+        (f"-{window_hours} hours", min_requests, limit),
+    )
+    rows = cursor.fetchall()
+
+    conn.close()
+    return rows
+
+
+@timed_query
+def get_user_downloads(
+    user_id: int, limit: int, before_id: int = None, after_id: int = None
+):
+    """Страница истории пользователя, от новых к старым.
+
+    Keyset-пагинация по id: before_id — страница старее, after_id — новее.
+    Без OFFSET запрос читает из индекса только limit строк на любой странице.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    if after_id is not None:
+        cursor.execute(
+            """
+            SELECT id, video_url, resolution, title, file_id FROM downloads
+            WHERE user_id = ? AND id > ?
+            ORDER BY id
+            LIMIT ?
+        """,
+            (user_id, after_id, limit),
+        )
+        rows = cursor.fetchall()[::-1]
+    else:
+        cursor.execute(
+            """
+            SELECT id, video_url, resolution, title, file_id FROM downloads
+            WHERE user_id = ? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+        """,
+            (user_id, MAX_ROWID if before_id is None else before_id, limit),
+        )
+        rows = cursor.fetchall()
+
+    conn.close()
+    return rows
+
+
+@timed_query
+def has_user_downloads_around(user_id: int, first_id: int, last_id: int):
+    """Есть ли у пользователя записи новее first_id и старее last_id"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT
+            EXISTS(SELECT 1 FROM downloads WHERE user_id = ? AND id > ?),
+            EXISTS(SELECT 1 FROM downloads WHERE user_id = ? AND id < ?)
+    """,
+        (user_id, first_id, user_id, last_id),
+    )
+    has_newer, has_older = cursor.fetchone()
+
+    conn.close()
+    return bool(has_newer), bool(has_older)
+
+
+@timed_query
+def get_user_download(user_id: int, download_id: int):
+    """Запись истории пользователя (чужие записи не отдаём)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT id, video_url, video_id, resolution, title, file_id FROM downloads
+        WHERE id = ? AND user_id = ?
+    """,
+        (download_id, user_id),
+    )
+    row = cursor.fetchone()
+
+    conn.close()
+    return row
+
+
+@timed_query
+def get_user_resolution_stats(user_id: int, limit: int = 20):
+    """Сколько раз пользователь выбирал каждое разрешение (последние limit загрузок)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT resolution, COUNT(*) AS count
+        FROM (
+            SELECT resolution FROM downloads
+            WHERE user_id = ? AND resolution IS NOT NULL
+            ORDER BY id DESC
+            LIMIT ?
+        )
+        GROUP BY resolution
+    """,
+        (user_id, limit),
+    )
+    stats = {row["resolution"]: row["count"] for row in cursor.fetchall()}
+
+    conn.close()
+    return stats
+
+
+@timed_query
+def has_downloads(user_id: int) -> bool:
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT 1 FROM downloads WHERE user_id = ? LIMIT 1", (user_id,))
+    result = cursor.fetchone() is not None
+
+    conn.close()
+    return result
+
+
+@timed_query
 def get_download_count():
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT COUNT(*) FROM downloads")
+    # Сумма по месяцам из сводки вместо COUNT(*) по всей таблице downloads
+    cursor.execute("SELECT COALESCE(SUM(downloads), 0) FROM stats_monthly")
     count = cursor.fetchone()[0]
 
     conn.close()
     return count
+
+
+@timed_query
+def get_hourly_stats(hours: int = 24):
+    """Загрузки по часам за последние hours часов (UTC, только непустые часы)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT hour, downloads FROM stats_hourly
+        WHERE hour >= strftime('%Y-%m-%d %H:00', 'now', ?)
+        ORDER BY hour
+    """,
+        (f"-{hours - 1} hours",),
+    )
+    rows = cursor.fetchall()
+
+    conn.close()
+    return rows
+
+
+@timed_query
+def get_daily_stats(days: int = None):
+    """Загрузки и активные пользователи по дням; days=None — вся история"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    if days is None:
+        cursor.execute(
+            "SELECT day, downloads, active_users FROM stats_daily ORDER BY day"
+        )
+    else:
+        cursor.execute(
+            """
+            SELECT day, downloads, active_users FROM stats_daily
+            WHERE day >= date('now', ?)
+            ORDER BY day
+        """,
+            (f"-{days - 1} days",),
+        )
+    rows = cursor.fetchall()
+
+    conn.close()
+    return rows
+
+
+@timed_query
+def get_monthly_active_users(month: str = None) -> int:
+    """MAU за месяц "YYYY-MM" (по умолчанию — текущий)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT active_users FROM stats_monthly
+        WHERE month = COALESCE(?, strftime('%Y-%m', 'now'))
+    """,
+        (month,),
+    )
+    row = cursor.fetchone()
+
+    conn.close()
+    return row["active_users"] if row else 0
+
+
+@timed_query
+def get_top_videos(limit: int = 10):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT video_key, video_url, title, downloads FROM stats_videos
+        ORDER BY downloads DESC
+        LIMIT ?
+    """,
+        (limit,),
+    )
+    rows = cursor.fetchall()
+
+    conn.close()
+    return rows
+
+
+@timed_query
+def get_resolution_stats():
+    """Сколько раз выбирали каждое разрешение/формат за всё время"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT resolution, downloads FROM stats_resolutions ORDER BY downloads DESC"
+    )
+    rows = cursor.fetchall()
+
+    conn.close()
+    return rows
+
+
+@timed_query
+def add_pending_job(kind: str, payload: str):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "INSERT INTO pending_jobs (kind, payload) VALUES (?, ?)", (kind, payload)
+    )
+
+    conn.commit()
+    conn.close()
+
+
+@timed_query
+def take_pending_jobs():
+    """Забрать сохранённые задачи и удалить их из базы"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, kind, payload FROM pending_jobs ORDER BY id")
+    jobs = cursor.fetchall()
+    cursor.execute("DELETE FROM pending_jobs")
+
+    conn.commit()
+    conn.close()
+    return jobs
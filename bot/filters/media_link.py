@@ -0,0 +1,13 @@
+from aiogram.filters import Filter
+
+from bot.services.sources import LINK_PATTERN
+
+
+class IsSupportedLink(Filter):
+    """Ссылка на видео с любой включённой площадки (bot/services/sources.py)"""
+
+    async def __call__(self, message) -> bool:
+        if not message.text:
+            return False
+
+        return bool(LINK_PATTERN.search(message.text))
@@ -1,3 +1,3 @@
-from . import admin, download, start
+from . import admin, download, history, inline, start
 
-__all__ = ["start", "download", "admin"]
+__all__ = ["start", "download", "history", "inline", "admin"]
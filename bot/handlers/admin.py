@@ -1,12 +1,17 @@
 import asyncio
 import logging
 
-from aiogram import F, Router
+from aiogram import Bot, Dispatcher, F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import BufferedInputFile, CallbackQuery, Message
 
-from bot.database.repository import get_all_users, get_download_count, get_user_count
+from bot.database.repository import (
+    get_all_users,
+    get_download_count,
+    get_user_count,
+    get_users_after,
+)
 from bot.filters.admin import IsAdmin
 from bot.keyboards.inline import (
     get_admin_keyboard,
@@ -14,8 +19,12 @@ from bot.keyboards.inline import (
     get_broadcast_confirm_keyboard,
     get_broadcast_type_keyboard,
     get_cancel_keyboard,
+    get_stats_keyboard,
 )
+from bot.services.analytics import build_stats_text, export_csv
 from bot.services.broadcast import BroadcastService
+from bot.services.lifecycle import lifecycle
+from bot.services.metrics import BROADCAST_MESSAGES
 from bot.states.admin import BroadcastStates
 
 router = Router()
@@ -61,25 +70,21 @@ async def admin_back_handler(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == "admin:stats", IsAdmin())
 async def admin_stats_handler(callback: CallbackQuery):
-    """Подробная статистика"""
-    users_count = get_user_count()
-    downloads_count = get_download_count()
-
-    avg_per_user = downloads_count / users_count if users_count > 0 else 0
-
-    text = (
-        "📊 <b>СТАТИСТИКА</b>\n\n"
-        f"👥 Всего пользователей: <b>{users_count}</b>\n"
-        f"📥 Всего загрузок: <b>{downloads_count}</b>\n"
-        f"📈 Среднее на пользователя: <b>{avg_per_user:.2f}</b>\n"
-    )
-
+    """Подробная статистика: активность по часам и дням, DAU/MAU, топ видео"""
     await callback.message.edit_text(
-        text, parse_mode="HTML", reply_markup=get_back_to_admin_keyboard()
+        build_stats_text(), parse_mode="HTML", reply_markup=get_stats_keyboard()
     )
     await callback.answer()
 
 
+@router.callback_query(F.data == "admin:export", IsAdmin())
+async def admin_export_handler(callback: CallbackQuery):
+    """Выгрузка статистики в CSV"""
+    for filename, data in export_csv():
+        await callback.message.answer_document(BufferedInputFile(data, filename))
+    await callback.answer()
+
+
 @router.callback_query(F.data == "admin:users", IsAdmin())
 async def admin_users_handler(callback: CallbackQuery):
     """Список последних пользователей"""
@@ -244,23 +249,70 @@ async def broadcast_confirm_handler(callback: CallbackQuery, state: FSMContext):
 
     status_msg = await callback.message.answer("📢 Начинаю рассылку...")
 
-    users = get_all_users()
-    total = len(users)
-    success = 0
-    failed = 0
+    payload = {
+        "chat_id": status_msg.chat.id,
+        "broadcast_type": broadcast_type,
+        "text": broadcast_text,
+        "photo_id": photo_id,
+        # Место, с которого продолжить: последний получатель и счётчики
+        "last_user_id": 0,
+        "sent": 0,
+        "success": 0,
+        "failed": 0,
+    }
+    # При остановке бота рассылка сохранится и продолжится с того же места
+    with lifecycle.track("broadcast", payload) as job:
+        await _run_broadcast(callback.bot, status_msg, job.payload)
+
+    await state.clear()
+    await callback.answer("✅ Рассылка завершена!")
+
+
+@router.callback_query(F.data == "admin:refresh", IsAdmin())
+async def admin_refresh_handler(callback: CallbackQuery):
+    """Обновить данные в админке"""
+    users_count = get_user_count()
+    downloads_count = get_download_count()
+
+    text = (
+        "🔧 <b>АДМИН-ПАНЕЛЬ</b>\n\n"
+        f"👥 Пользователей: <b>{users_count}</b>\n"
+        f"📥 Загрузок: <b>{downloads_count}</b>\n\n"
+        "Выберите действие:"
+    )
+
+    await callback.message.edit_text(
+        text, parse_mode="HTML", reply_markup=get_admin_keyboard()
+    )
+    await callback.answer("🔄 Данные обновлены")
 
-    for i, user in enumerate(users, 1):
+
+async def _run_broadcast(bot: Bot, status_msg: Message, payload: dict):
+    """Разослать сообщение пользователям с user_id больше payload["last_user_id"]"""
+    broadcast_type = payload["broadcast_type"]
+    broadcast_text = payload["text"]
+    photo_id = payload["photo_id"]
+
+    users = get_users_after(payload["last_user_id"])
+    total = payload["sent"] + len(users)
+
+    for user in users:
         try:
             if broadcast_type == "photo" and photo_id:
-                await callback.bot.send_photo(
+                await bot.send_photo(
                     user["user_id"], photo=photo_id, caption=broadcast_text
                 )
             else:
-                await callback.bot.send_message(user["user_id"], broadcast_text)
-            success += 1
+                await bot.send_message(user["user_id"], broadcast_text)
+            payload["success"] += 1
+            BROADCAST_MESSAGES.inc(result="ok")
         except Exception as e:
             logger.error(f"Failed to send to {user['user_id']}: {e}")
-            failed += 1
+            payload["failed"] += 1
+            BROADCAST_MESSAGES.inc(result="error", error=type(e).__name__)
+        payload["last_user_id"] = user["user_id"]
+        payload["sent"] += 1
+        i = payload["sent"]
 
         # Обновляем прогресс каждые 10 сообщений
         if i % 10 == 0 or i == total:
@@ -269,10 +321,10 @@ async def broadcast_confirm_handler(callback: CallbackQuery, state: FSMContext):
                 await status_msg.edit_text(
                     f"📢 Рассылка в процессе...\n\n"
                     f"Прогресс: {i}/{total} ({progress:.1f}%)\n"
-                    f"✅ Успешно: {success}\n"
-                    f"❌ Ошибок: {failed}"
+                    f"✅ Успешно: {payload['success']}\n"
+                    f"❌ Ошибок: {payload['failed']}"
                 )
-            except:
+            except Exception:
                 pass
 
         await asyncio.sleep(0.05)
@@ -281,30 +333,22 @@ async def broadcast_confirm_handler(callback: CallbackQuery, state: FSMContext):
     await status_msg.edit_text(
         f"✅ <b>РАССЫЛКА ЗАВЕРШЕНА!</b>\n\n"
         f"📊 Всего: {total}\n"
-        f"✅ Отправлено: {success}\n"
-        f"❌ Ошибок: {failed}",
+        f"✅ Отправлено: {payload['success']}\n"
+        f"❌ Ошибок: {payload['failed']}",
         parse_mode="HTML",
         reply_markup=get_back_to_admin_keyboard(),
     )
 
-    await state.clear()
-    await callback.answer("✅ Рассылка завершена!")
-
 
-@router.callback_query(F.data == "admin:refresh", IsAdmin())
-async def admin_refresh_handler(callback: CallbackQuery):
-    """Обновить данные в админке"""
-    users_count = get_user_count()
-    downloads_count = get_download_count()
+async def _resume_broadcast(bot: Bot, payload: dict, dispatcher: Dispatcher):
+    """Продолжить рассылку, прерванную перезапуском бота"""
+    with lifecycle.track("broadcast", payload):
+        status_msg = await bot.send_message(
+            payload["chat_id"],
+            f"♻️ Бот перезапускался, продолжаю рассылку с {payload['sent'] + 1}-го "
+            "пользователя...",
+        )
+        await _run_broadcast(bot, status_msg, payload)
 
-    text = (
-        "🔧 <b>АДМИН-ПАНЕЛЬ</b>\n\n"
-        f"👥 Пользователей: <b>{users_count}</b>\n"
-        f"📥 Загрузок: <b>{downloads_count}</b>\n\n"
-        "Выберите действие:"
-    )
 
-    await callback.message.edit_text(
-        text, parse_mode="HTML", reply_markup=get_admin_keyboard()
-    )
-    await callback.answer("🔄 Данные обновлены")
+lifecycle.register_resumer("broadcast", _resume_broadcast)
@@ -1,17 +1,94 @@
-from aiogram import F, Router
-from aiogram.filters import Command
-from aiogram.types import CallbackQuery, FSInputFile, Message, URLInputFile
+import asyncio
+import html
+import logging
+import os
+from contextlib import nullcontext
 
-from bot.filters.youtube_link import IsYouTubeShorts
-from bot.keyboards.inline import get_resolution_keyboard
-from bot.services.youtube import YouTubeDownloader
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import Command
+from aiogram.types import (
+    BufferedInputFile,
+    CallbackQuery,
+    FSInputFile,
+    LinkPreviewOptions,
+    Message,
+)
+
+from bot.config import PROGRESS_EDIT_INTERVAL, STORAGE_CHAT_ID, UPLOAD_TIMEOUT
+from bot.filters.media_link import IsSupportedLink
+from bot.keyboards.inline import (
+    get_download_cancel_keyboard,
+    get_resolution_keyboard,
+)
+from bot.services.lifecycle import lifecycle
+from bot.services.metrics import UPLOADED_BYTES, cache_lookup
+from bot.services.prefetch_policy import choose_prefetch_resolution
+from bot.services.progress import ProgressChannel, run_progress_reporter
+from bot.services.sources import find_link, sources_title
+from bot.services.thumbnails import ThumbnailCache
+from bot.services.youtube import (
+    ANIMATION_MODE,
+    AUDIO_MODE,
+    DownloadResult,
+    VideoInfo,
+    YouTubeDownloader,
+    format_label,
+)
+from bot.utils.tracing import span
 
 router = Router()
-youtube_service = YouTubeDownloader()
+logger = logging.getLogger(__name__)
+# youtube_service и thumbnail_cache создаются при старте диспетчера (main.py)
+# и приходят в хендлеры из workflow data
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора
+_background_tasks = set()
+
+# Длина названия в подписи к превью: подпись к фото — не больше 1024 символов
+TITLE_CAPTION_LIMIT = 200
+
+
+def _run_in_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _warm_thumbnail(
+    bot: Bot, thumbnail_cache: ThumbnailCache, video_info: VideoInfo
+):
+    """Загрузить превью в служебный чат, чтобы дальше отправлять его по file_id"""
+    if not STORAGE_CHAT_ID or not video_info.video_id:
+        return
+
+    data = await thumbnail_cache.fetch(video_info.thumbnail)
+    if not data:
+        return
+
+    try:
+        sent = await bot.send_photo(
+            STORAGE_CHAT_ID,
+            photo=BufferedInputFile(data, filename=f"{video_info.video_id}.jpg"),
+        )
+        thumbnail_cache.remember(video_info.video_id, sent.photo[-1].file_id)
+    except Exception as e:
+        logger.warning("Не удалось сохранить превью: %s", e)
+
+
+async def _edit_preview(message: Message, text: str, reply_markup=None):
+    """Изменить превью: фото с подписью или обычный текст"""
+    if message.photo:
+        await message.edit_caption(caption=text, reply_markup=reply_markup)
+    else:
+        await message.edit_text(text, reply_markup=reply_markup)
 
 
-@router.message(Command("download"))
-async def download_command_handler(message: Message):
+@router.message(Command("download"), flags={"throttle": "metadata"})
+async def download_command_handler(
+    message: Message,
+    youtube_service: YouTubeDownloader,
+    thumbnail_cache: ThumbnailCache,
+):
     """Обработчик команды /download <url>"""
 
     parts = message.text.split(maxsplit=1)
@@ -19,31 +96,42 @@ async def download_command_handler(message: Message):
     if len(parts) < 2:
         await message.answer(
             "❌ Использование: /download <ссылка>\n\n"
-            "Пример: /download https://youtube.com/shorts/ABC123"
+            "Пример: /download https://youtube.com/shorts/ABC123\n\n"
+            f"Поддерживаются: {sources_title()}"
         )
         return
 
     url = parts[1]
-    await process_video_info(message, url)
+    await process_video_info(message, url, youtube_service, thumbnail_cache)
 
 
 @router.message(F.text == "📥 Download")
 async def download_button_handler(message: Message):
     """Обработчик кнопки Download"""
     await message.answer(
-        "📎 Отправьте ссылку на YouTube Shorts:\n\n"
+        f"📎 Отправьте ссылку на видео ({sources_title()}):\n\n"
         "Например: https://youtube.com/shorts/ABC123"
     )
 
 
-@router.message(IsYouTubeShorts())
-async def download_link_handler(message: Message):
+@router.message(IsSupportedLink(), flags={"throttle": "metadata"})
+async def download_link_handler(
+    message: Message,
+    youtube_service: YouTubeDownloader,
+    thumbnail_cache: ThumbnailCache,
+):
     """Обработчик просто отправленной ссылки"""
-    url = message.text
-    await process_video_info(message, url)
+    with span("url_parse"):
+        url = find_link(message.text)
+    await process_video_info(message, url, youtube_service, thumbnail_cache)
 
 
-async def process_video_info(message: Message, url: str):
+async def process_video_info(
+    message: Message,
+    url: str,
+    youtube_service: YouTubeDownloader,
+    thumbnail_cache: ThumbnailCache,
+):
     """Получить информацию о видео и показать превью с выбором разрешения"""
     user_id = message.from_user.id
 
@@ -59,40 +147,53 @@ async def process_video_info(message: Message, url: str):
             duration_minutes = video_info.duration // 60
             duration_seconds = video_info.duration % 60
 
+            title = video_info.title
+            if len(title) > TITLE_CAPTION_LIMIT:
+                title = title[: TITLE_CAPTION_LIMIT - 1] + "…"
             caption = (
-                f"🎬 <b>{video_info.title}</b>\n\n"
+                f"🎬 <b>{html.escape(title)}</b>\n\n"
                 f"⏱ Длительность: {duration_minutes}:{duration_seconds:02d}\n\n"
                 f"📊 Выберите качество видео:"
             )
 
+            keyboard = get_resolution_keyboard(
+                video_info.available_resolutions, audio=video_info.audio_available
+            )
+            thumbnail_id = thumbnail_cache.get_file_id(video_info.video_id)
+            cache_lookup("thumbnail", bool(thumbnail_id))
+
             # Отправляем превью с кнопками выбора разрешения
-            if video_info.thumbnail:
-                try:
-                    await message.answer_photo(
-                        photo=URLInputFile(video_info.thumbnail),
-                        caption=caption,
-                        parse_mode="HTML",
-                        reply_markup=get_resolution_keyboard(
-                            video_info.available_resolutions
-                        ),
-                    )
-                except Exception as e:
-                    # Если не удалось загрузить превью, отправляем только текст
-                    await message.answer(
-                        caption,
-                        parse_mode="HTML",
-                        reply_markup=get_resolution_keyboard(
-                            video_info.available_resolutions
-                        ),
-                    )
-            else:
+            if thumbnail_id:
+                await message.answer_photo(
+                    photo=thumbnail_id,
+                    caption=caption,
+                    parse_mode="HTML",
+                    reply_markup=keyboard,
+                )
+            elif video_info.thumbnail:
+                # Кнопки сразу, картинку Telegram подтянет сам через превью ссылки
                 await message.answer(
                     caption,
                     parse_mode="HTML",
-                    reply_markup=get_resolution_keyboard(
-                        video_info.available_resolutions
+                    reply_markup=keyboard,
+                    link_preview_options=LinkPreviewOptions(
+                        url=video_info.thumbnail,
+                        prefer_large_media=True,
+                        show_above_text=True,
                     ),
                 )
+                _run_in_background(
+                    _warm_thumbnail(message.bot, thumbnail_cache, video_info)
+                )
+            else:
+                await message.answer(caption, parse_mode="HTML", reply_markup=keyboard)
+
+            # Пока пользователь выбирает, начинаем качать самое вероятное разрешение
+            resolution = choose_prefetch_resolution(
+                user_id, video_info.available_resolutions
+            )
+            if resolution:
+                youtube_service.start_speculative_download(user_id, resolution)
         else:
             await message.answer(f"❌ {result.error}")
 
@@ -100,56 +201,222 @@ async def process_video_info(message: Message, url: str):
         await loading_msg.delete()
 
 
-@router.callback_query(F.data.startswith("resolution:"))
-async def resolution_callback_handler(callback: CallbackQuery):
+async def send_media(bot: Bot, chat_id: int, media, caption: str, resolution: str):
+    """Отправить результат методом, подходящим для формата"""
+    if resolution == AUDIO_MODE:
+        return await bot.send_audio(chat_id, audio=media, caption=caption)
+    if resolution == ANIMATION_MODE:
+        return await bot.send_animation(chat_id, animation=media, caption=caption)
+
+    # supports_streaming=False отключает потоковую передачу и сжатие
+    return await bot.send_video(
+        chat_id,
+        video=media,
+        caption=caption,
+        supports_streaming=False,  # Отключаем сжатие!
+        width=None,  # Не указываем размеры
+        height=None,
+    )
+
+
+def done_caption(resolution: str) -> str:
+    if resolution == AUDIO_MODE:
+        return "✅ Готово! 🎵 Аудио"
+    if resolution == ANIMATION_MODE:
+        return "✅ Готово! 🎞 GIF"
+    return f"✅ Готово! Качество: {resolution}p"
+
+
+async def _send_video(
+    bot: Bot,
+    youtube_service: YouTubeDownloader,
+    chat_id: int,
+    result: DownloadResult,
+    resolution: str,
+):
+    """Отправить скачанное видео, аудио или GIF либо уже загруженное по file_id"""
+    caption = done_caption(resolution)
+
+    if result.file_id:
+        # Файл уже есть в Telegram — отправляем без скачивания
+        logger.info("Отправляем из кэша file_id: %s", result.video_info.video_id)
+
+        with span("upload", cached=True):
+            await asyncio.wait_for(
+                send_media(bot, chat_id, result.file_id, caption, resolution),
+                UPLOAD_TIMEOUT,
+            )
+        return
+
+    size_bytes = os.path.getsize(result.video_path)
+    file_size = size_bytes / (1024 * 1024)  # В МБ
+    logger.info("Отправляем %s: %.2f MB", format_label(resolution), file_size)
+
+    media = FSInputFile(result.video_path)
+    if resolution == AUDIO_MODE and result.video_info:
+        # Имя файла в плеере Telegram — название ролика; в кэше аудио лежит
+        # под .mp4, но внутри это AAC в m4a-контейнере
+        media = FSInputFile(
+            result.video_path, filename=f"{result.video_info.title}.m4a"
+        )
+
+    # Отправляем БЕЗ сжатия
+    try:
+        with span("upload", size_mb=f"{file_size:.2f}"):
+            sent = await asyncio.wait_for(
+                send_media(
+                    bot,
+                    chat_id,
+                    media,
+                    f"{caption}\n📦 Размер: {file_size:.1f} MB",
+                    resolution,
+                ),
+                UPLOAD_TIMEOUT,
+            )
+    finally:
+        youtube_service.cleanup(result.video_path)
+    UPLOADED_BYTES.inc(size_bytes)
+
+    # Запоминаем file_id, чтобы повторно отдавать файл без скачивания
+    uploaded = sent.audio or sent.animation or sent.video
+    if uploaded and result.video_info:
+        youtube_service.remember_file_id(
+            result.video_info.video_id,
+            resolution,
+            uploaded.file_id,
+            download_id=result.download_id,
+        )
+
+
+@router.callback_query(F.data.startswith("resolution:"), flags={"throttle": "download"})
+async def resolution_callback_handler(
+    callback: CallbackQuery, youtube_service: YouTubeDownloader
+):
     """Обработчик выбора разрешения"""
     resolution = callback.data.split(":")[1]
     user_id = callback.from_user.id
 
-    print(f"👤 Пользователь {user_id} выбрал разрешение: {resolution}p")
+    logger.info("Пользователь %s выбрал формат: %s", user_id, format_label(resolution))
+
+    # При остановке бота незавершённая загрузка сохранится и продолжится
+    video_info = youtube_service.video_cache.get(user_id)
+    job = (
+        lifecycle.track(
+            "download",
+            {
+                "user_id": user_id,
+                "chat_id": callback.message.chat.id,
+                "url": video_info.url,
+                "resolution": resolution,
+            },
+        )
+        if video_info
+        else nullcontext()
+    )
 
     # Обновляем сообщение
-    await callback.message.edit_caption(
-        caption=f"⏳ Скачиваю видео в разрешении {resolution}p...", reply_markup=None
+    cancel_keyboard = get_download_cancel_keyboard()
+    await _edit_preview(
+        callback.message,
+        f"⏳ Скачиваю {format_label(resolution)}...",
+        cancel_keyboard,
     )
 
     try:
-        result = await youtube_service.download_video_by_resolution(user_id, resolution)
+        with job:
+            progress = ProgressChannel()
+            reporter = asyncio.create_task(
+                run_progress_reporter(
+                    progress,
+                    lambda text: _edit_preview(callback.message, text, cancel_keyboard),
+                    format_label(resolution),
+                    min_interval=PROGRESS_EDIT_INTERVAL,
+                )
+            )
+            try:
+                result = await youtube_service.download_video_by_resolution(
+                    user_id, resolution, progress
+                )
+            finally:
+                progress.close()
+                reporter.cancel()
+
+            if result.success:
+                if result.video_path:
+                    file_size = os.path.getsize(result.video_path) / (1024 * 1024)
+                    await _edit_preview(
+                        callback.message,
+                        f"📤 Отправляю {format_label(resolution)} ({file_size:.1f} MB)...",
+                    )
 
-        if result.success:
-            video_file = FSInputFile(result.video_path)
+                await _send_video(
+                    callback.bot,
+                    youtube_service,
+                    callback.message.chat.id,
+                    result,
+                    resolution,
+                )
+                youtube_service.clear_cache(user_id)
 
-            # Получаем размер файла
-            import os
+                # Удаляем сообщение с превью
+                await callback.message.delete()
+            else:
+                await _edit_preview(callback.message, f"❌ {result.error}")
 
-            file_size = os.path.getsize(result.video_path) / (1024 * 1024)  # В МБ
+    except asyncio.TimeoutError:
+        logger.error("Отправка видео пользователю %s не уложилась в срок", user_id)
+        await _edit_preview(
+            callback.message,
+            "❌ Не удалось отправить видео: Telegram не ответил вовремя",
+        )
 
-            print(f"📤 Отправляем видео: {file_size:.2f} MB")
+    except Exception as e:
+        logger.exception("Ошибка при отправке: %s", e)
+        await _edit_preview(callback.message, f"❌ Ошибка: {str(e)}")
 
-            # Отправляем видео БЕЗ сжатия
-            # supports_streaming=False отключает потоковую передачу и сжатие
-            await callback.message.answer_video(
-                video=video_file,
-                caption=f"✅ Готово! Качество: {resolution}p\n📦 Размер: {file_size:.1f} MB",
-                supports_streaming=False,  # Отключаем сжатие!
-                width=None,  # Не указываем размеры
-                height=None,
-            )
+    await callback.answer()
 
-            youtube_service.cleanup(result.video_path)
-            youtube_service.clear_cache(user_id)
 
-            # Удаляем сообщение с превью
-            await callback.message.delete()
-        else:
-            await callback.message.edit_caption(
-                caption=f"❌ {result.error}", reply_markup=None
-            )
+async def _resume_download(bot: Bot, payload: dict, dispatcher: Dispatcher):
+    """Продолжить загрузку, прерванную перезапуском бота"""
+    youtube_service: YouTubeDownloader = dispatcher["youtube_service"]
+    user_id = payload["user_id"]
+    chat_id = payload["chat_id"]
+    resolution = payload["resolution"]
 
-    except Exception as e:
-        print(f"❌ Ошибка при отправке: {e}")
-        await callback.message.edit_caption(
-            caption=f"❌ Ошибка: {str(e)}", reply_markup=None
+    with lifecycle.track("download", payload):
+        status_msg = await bot.send_message(
+            chat_id,
+            f"♻️ Бот перезапускался, продолжаю загрузку: {format_label(resolution)}...",
         )
+        try:
+            result = await youtube_service.get_video_info(payload["url"], user_id)
+            if result.success:
+                result = await youtube_service.download_video_by_resolution(
+                    user_id, resolution
+                )
 
-    await callback.answer()
+            if result.success:
+                await _send_video(bot, youtube_service, chat_id, result, resolution)
+                youtube_service.clear_cache(user_id)
+                await status_msg.delete()
+            else:
+                await status_msg.edit_text(f"❌ {result.error}")
+
+        except Exception as e:
+            logger.exception("Не удалось продолжить загрузку: %s", e)
+            await status_msg.edit_text(f"❌ Ошибка: {str(e)}")
+
+
+lifecycle.register_resumer("download", _resume_download)
+
+
+@router.callback_query(F.data == "download:cancel")
+async def download_cancel_handler(
+    callback: CallbackQuery, youtube_service: YouTubeDownloader
+):
+    """Отмена скачивания кнопкой под прогрессом"""
+    if youtube_service.cancel_user_download(callback.from_user.id):
+        await callback.answer("⏹ Загрузка отменена")
+    else:
+        await callback.answer("Загрузка уже завершилась")
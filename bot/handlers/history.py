@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Optional
+
+from aiogram import F, Router
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery, Message
+
+from bot.config import HISTORY_PAGE_SIZE, UPLOAD_TIMEOUT
+from bot.database.repository import (
+    get_user_download,
+    get_user_downloads,
+    has_user_downloads_around,
+)
+from bot.handlers.download import done_caption, send_media
+from bot.keyboards.inline import get_history_keyboard
+from bot.services.metrics import cache_lookup
+from bot.services.youtube import ANIMATION_MODE, AUDIO_MODE, YouTubeDownloader
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+HISTORY_TEXT = (
+    "📜 <b>Ваши загрузки</b>\n\nНажмите на запись, чтобы получить файл ещё раз"
+)
+
+
+def _history_label(row) -> str:
+    """Подпись кнопки: значок формата, название и разрешение"""
+    title = row["title"] or row["video_url"]
+    if len(title) > 40:
+        title = title[:39] + "…"
+
+    resolution = row["resolution"]
+    if resolution == AUDIO_MODE:
+        return f"🎵 {title}"
+    if resolution == ANIMATION_MODE:
+        return f"🎞 {title}"
+    return f"🎬 {title} · {resolution}p" if resolution else f"🎬 {title}"
+
+
+def _history_page(
+    user_id: int, before_id: Optional[int] = None, after_id: Optional[int] = None
+):
+    """Страница истории: (текст, клавиатура) или (текст, None), если пусто"""
+    rows = get_user_downloads(
+        user_id, HISTORY_PAGE_SIZE, before_id=before_id, after_id=after_id
+    )
+    if not rows:
+        return "📭 Вы ещё ничего не скачивали", None
+
+    first_id, last_id = rows[0]["id"], rows[-1]["id"]
+    has_newer, has_older = has_user_downloads_around(user_id, first_id, last_id)
+
+    keyboard = get_history_keyboard(
+        [(row["id"], _history_label(row)) for row in rows],
+        older_id=last_id if has_older else None,
+        newer_id=first_id if has_newer else None,
+    )
+    return HISTORY_TEXT, keyboard
+
+
+@router.message(Command("history"))
+async def history_command_handler(message: Message):
+    """Последние загрузки пользователя"""
+    text, keyboard = _history_page(message.from_user.id)
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+@router.callback_query(F.data.regexp(r"^history:(older|newer):\d+$"))
+async def history_page_handler(callback: CallbackQuery):
+    """Листание истории"""
+    _, direction, cursor_id = callback.data.split(":")
+    cursor_id = int(cursor_id)
+
+    if direction == "older":
+        text, keyboard = _history_page(callback.from_user.id, before_id=cursor_id)
+    else:
+        text, keyboard = _history_page(callback.from_user.id, after_id=cursor_id)
+
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.callback_query(
+    F.data.regexp(r"^history:send:\d+$"), flags={"throttle": "download"}
+)
+async def history_send_handler(
+    callback: CallbackQuery, youtube_service: YouTubeDownloader
+):
+    """Повторная отправка файла из истории по file_id, без скачивания"""
+    download_id = int(callback.data.split(":")[2])
+    row = get_user_download(callback.from_user.id, download_id)
+    if not row:
+        await callback.answer("Запись не найдена")
+        return
+
+    resolution = row["resolution"]
+    # Если в этой записи file_id нет (не успели отправить), он мог остаться
+    # от другой отправки того же видео
+    file_id = row["file_id"] or youtube_service.get_cached_file_id(
+        row["video_id"], resolution
+    )
+    cache_lookup("history_file_id", bool(file_id))
+
+    if not file_id:
+        await callback.answer()
+        await callback.message.answer(
+            "⚠️ Этот файл не сохранился. Отправьте ссылку заново:\n"
+            f"{row['video_url']}"
+        )
+        return
+
+    await callback.answer("📤 Отправляю...")
+    try:
+        await asyncio.wait_for(
+            send_media(
+                callback.bot,
+                callback.message.chat.id,
+                file_id,
+                done_caption(resolution),
+                resolution,
+            ),
+            UPLOAD_TIMEOUT,
+        )
+    except Exception as e:
+        logger.error("Не удалось отправить из истории: %s", e)
+        await callback.message.answer(f"❌ Не удалось отправить: {str(e)}")
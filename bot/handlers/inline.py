@@ -0,0 +1,122 @@
+import asyncio
+import logging
+
+from aiogram import Bot, F, Router
+from aiogram.types import (
+    ChosenInlineResult,
+    FSInputFile,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InlineQueryResultCachedVideo,
+    InputMediaVideo,
+    InputTextMessageContent,
+)
+
+from bot.config import INLINE_RESOLUTION, STORAGE_CHAT_ID
+from bot.services.metrics import cache_lookup
+from bot.services.sources import LINK_PATTERN, find_link, find_source
+from bot.services.youtube import YouTubeDownloader, extract_video_id
+
+# Inline-режим нужно включить в @BotFather (/setinline), а для подмены
+# заглушки на видео — ещё и /setinlinefeedback (иначе не придёт chosen_inline_result)
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+async def _publish_to_storage(bot: Bot, video_path: str) -> str:
+    """Загрузить видео в служебный чат и вернуть его file_id"""
+    message = await bot.send_video(
+        STORAGE_CHAT_ID, video=FSInputFile(video_path), supports_streaming=False
+    )
+    return message.video.file_id
+
+
+def _start_prefetch(
+    bot: Bot, youtube_service: YouTubeDownloader, url: str
+) -> asyncio.Task:
+    return youtube_service.prefetch(
+        url,
+        INLINE_RESOLUTION,
+        publish=lambda video_path: _publish_to_storage(bot, video_path),
+    )
+
+
+@router.inline_query(F.query.regexp(LINK_PATTERN), flags={"throttle": "download"})
+async def inline_query_handler(
+    inline_query: InlineQuery, bot: Bot, youtube_service: YouTubeDownloader
+):
+    """Inline-запрос со ссылкой: отдаём видео из кэша или заглушку"""
+    url = find_link(inline_query.query)
+    source = find_source(url)
+    video_id = source.video_id(url)
+
+    if not video_id or not STORAGE_CHAT_ID:
+        await inline_query.answer([], cache_time=60)
+        return
+
+    file_id = youtube_service.get_cached_file_id(video_id, INLINE_RESOLUTION)
+    cache_lookup("inline_file_id", bool(file_id))
+
+    if file_id:
+        result = InlineQueryResultCachedVideo(
+            id=f"cached:{video_id}",
+            video_file_id=file_id,
+            title=f"🎬 {source.title}",
+            description=f"Качество: {INLINE_RESOLUTION}p",
+        )
+        await inline_query.answer([result], cache_time=300)
+        return
+
+    # Отвечаем сразу, а скачивание идёт в фоне
+    _start_prefetch(bot, youtube_service, url)
+
+    placeholder = InlineQueryResultArticle(
+        id=f"pending:{video_id}",
+        title="⏳ Видео готовится...",
+        description="Нажмите — видео появится в сообщении после загрузки",
+        input_message_content=InputTextMessageContent(
+            message_text=f"⏳ Загружаю видео...\n{url}"
+        ),
+        # Без клавиатуры Telegram не вернёт inline_message_id для редактирования
+        reply_markup=InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text=f"🔗 {source.title}", url=url)]]
+        ),
+    )
+    await inline_query.answer([placeholder], cache_time=0, is_personal=True)
+
+
+@router.chosen_inline_result(F.result_id.startswith("pending:"))
+async def chosen_pending_result_handler(
+    chosen: ChosenInlineResult, bot: Bot, youtube_service: YouTubeDownloader
+):
+    """Пользователь отправил заглушку — подменяем её на видео после загрузки"""
+    if not chosen.inline_message_id:
+        return
+
+    url = find_link(chosen.query)
+    if not url:
+        return
+
+    file_id = youtube_service.get_cached_file_id(
+        extract_video_id(url), INLINE_RESOLUTION
+    )
+
+    try:
+        if not file_id:
+            # shield: одна фоновая задача может ждать нескольких сообщений
+            file_id = await asyncio.shield(_start_prefetch(bot, youtube_service, url))
+
+        await bot.edit_message_media(
+            inline_message_id=chosen.inline_message_id,
+            media=InputMediaVideo(
+                media=file_id, caption=f"✅ Качество: {INLINE_RESOLUTION}p"
+            ),
+        )
+    except Exception as e:
+        logger.error("Ошибка inline-загрузки: %s", e)
+        await bot.edit_message_text(
+            inline_message_id=chosen.inline_message_id,
+            text=f"❌ Не удалось скачать видео\n{url}",
+        )
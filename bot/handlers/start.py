@@ -3,6 +3,7 @@ from aiogram.filters import Command
 from aiogram.types import Message
 
 from bot.keyboards.reply import get_main_keyboard
+from bot.services.sources import sources_title
 
 router = Router()
 
@@ -13,7 +14,8 @@ async def start_handler(message: Message):
 
     await message.answer(
         f"👋 Привет, {message.from_user.first_name}!\n\n"
-        "Я бот для скачивания YouTube Shorts.\n\n"
-        "📎 Отправь мне ссылку на видео или нажми кнопку 📥 Download",
+        f"Я бот для скачивания видео: {sources_title()}.\n\n"
+        "📎 Отправь мне ссылку на видео или нажми кнопку 📥 Download\n"
+        "📜 /history — твои прошлые загрузки",
         reply_markup=get_main_keyboard(),
     )
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -68,6 +68,24 @@ def get_cancel_keyboard():
     return keyboard
 
 
+def get_stats_keyboard():
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="📄 Выгрузить CSV", callback_data="admin:export"
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="◀️ Назад в админку", callback_data="admin:back"
+                )
+            ],
+        ]
+    )
+    return keyboard
+
+
 def get_back_to_admin_keyboard():
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -77,8 +95,8 @@ def get_back_to_admin_keyboard():
     return keyboard
 
 
-def get_resolution_keyboard(available_resolutions: List[str]):
-    """Клавиатура выбора разрешения видео"""
+def get_resolution_keyboard(available_resolutions: Sequence[str], audio: bool = True):
+    """Клавиатура выбора разрешения видео, аудио (если audio) или GIF"""
     resolution_names = {
         "480": "480p 📺",
         "720": "720p HD 🎬",
@@ -103,5 +121,57 @@ def get_resolution_keyboard(available_resolutions: List[str]):
     if row:
         buttons.append(row)
 
+    # Без видео: только звук или короткая анимация
+    row = []
+    if audio:
+        row.append(
+            InlineKeyboardButton(text="🎵 Аудио", callback_data="resolution:audio")
+        )
+    row.append(InlineKeyboardButton(text="🎞 GIF", callback_data="resolution:gif"))
+    buttons.append(row)
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    return keyboard
+
+
+def get_download_cancel_keyboard():
+    """Кнопка отмены под сообщением с прогрессом скачивания"""
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="❌ Отменить", callback_data="download:cancel")]
+        ]
+    )
+    return keyboard
+
+
+def get_history_keyboard(
+    items: List[Tuple[int, str]], older_id: Optional[int], newer_id: Optional[int]
+):
+    """История загрузок: кнопка на каждую запись и листание страниц.
+
+    items — пары (id записи, подпись); older_id/newer_id — ключи соседних
+    страниц (None, если листать некуда).
+    """
+    buttons = [
+        [InlineKeyboardButton(text=label, callback_data=f"history:send:{item_id}")]
+        for item_id, label in items
+    ]
+
+    navigation = []
+    if newer_id is not None:
+        navigation.append(
+            InlineKeyboardButton(
+                text="◀️ Новее", callback_data=f"history:newer:{newer_id}"
+            )
+        )
+    if older_id is not None:
+        navigation.append(
+            InlineKeyboardButton(
+                text="Старее ▶️", callback_data=f"history:older:{older_id}"
+            )
+        )
+    if navigation:
+        buttons.append(navigation)
+
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     return keyboard
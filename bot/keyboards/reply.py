@@ -5,6 +5,6 @@ def get_main_keyboard():
     keyboard = ReplyKeyboardMarkup(
         keyboard=[[KeyboardButton(text="📥 Download")]],
         resize_keyboard=True,
-        input_field_placeholder="Отправьте ссылку на YouTube Shorts",
+        input_field_placeholder="Отправьте ссылку на видео",
     )
     return keyboard
@@ -0,0 +1,99 @@
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from bot.config import ADMIN_IDS
+from bot.services.backpressure import Backpressure
+from bot.services.metrics import SHED_UPDATES
+
+OVERLOADED_TEXT = "⚠️ Бот сейчас перегружен, попробуйте через минуту."
+QUEUED_TEXT = "⏳ Предыдущий запрос ещё в очереди"
+
+# Кнопки, которые обрабатываются мгновенно и без слота. Отмена загрузки
+# не должна ждать, пока освободятся слоты, занятые теми самыми загрузками
+CHEAP_CALLBACKS = {"download:cancel"}
+
+
+def _priority(event: Update) -> str:
+    # Кнопки продолжают уже начатое (выбор разрешения, история) — их вперёд.
+    # Inline-запрос через несколько секунд никому не нужен — его отбрасываем
+    if event.callback_query:
+        return "high"
+    if event.inline_query:
+        return "low"
+    return "normal"
+
+
+class BackpressureMiddleware(BaseMiddleware):
+    """Outer middleware апдейтов: обработка только со слотом из Backpressure.
+
+    Если слота нет, апдейт ждёт своей очереди, а на сообщение пользователь
+    сразу получает ответ "вы №N в очереди". У пользователя ждёт не больше
+    одного апдейта: middleware стоит до ThrottlingMiddleware, и без этого
+    один флудер занял бы всю очередь. Остальные его апдейты отбрасываются.
+    Когда ждущих больше MAX_WAITING_UPDATES, новые апдейты отклоняются.
+    Кнопки из CHEAP_CALLBACKS слот не занимают.
+    """
+
+    def __init__(self, backpressure: Backpressure):
+        self.backpressure = backpressure
+        # Пользователи, у которых апдейт сейчас ждёт слота
+        self.waiting_users: Set[int] = set()
+
+    async def _reject(self, event: Update):
+        if event.callback_query:
+            await event.callback_query.answer(OVERLOADED_TEXT)
+        elif event.message:
+            await event.message.answer(OVERLOADED_TEXT)
+
+    async def _wait(self, event: Update, user_id: int, priority: str):
+        async def notify(position: int):
+            await event.message.answer(
+                f"⏳ Бот сейчас загружен, вы №{position} в очереди. "
+                "Отвечу автоматически, отправлять ссылку ещё раз не нужно."
+            )
+
+        # Отмечаем до ответа пользователю: пока он отправляется, следующее
+        # сообщение того же пользователя уже должно быть отброшено
+        self.waiting_users.add(user_id)
+        try:
+            await self.backpressure.acquire(
+                priority, on_queued=notify if event.message else None
+            )
+        finally:
+            self.waiting_users.discard(user_id)
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or user.id in ADMIN_IDS:
+            return await handler(event, data)
+        if event.callback_query and event.callback_query.data in CHEAP_CALLBACKS:
+            return await handler(event, data)
+
+        priority = _priority(event)
+        if not self.backpressure.try_acquire(priority):
+            if user.id in self.waiting_users:
+                # Про очередь пользователь уже знает: на сообщение не отвечаем
+                SHED_UPDATES.inc(event=event.event_type, action="dropped")
+                if event.callback_query:
+                    await event.callback_query.answer(QUEUED_TEXT)
+                return None
+
+            if priority == "low" or self.backpressure.full():
+                SHED_UPDATES.inc(event=event.event_type, action="dropped")
+                await self._reject(event)
+                return None
+
+            SHED_UPDATES.inc(event=event.event_type, action="deferred")
+            await self._wait(event, user.id, priority)
+
+        try:
+            return await handler(event, data)
+        finally:
+            self.backpressure.release()
@@ -0,0 +1,19 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from bot.utils.tracing import set_correlation_id
+
+
+class CorrelationMiddleware(BaseMiddleware):
+    """Присваивает каждому апдейту ID для связки логов и замеров"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        set_correlation_id(f"upd-{event.update_id}")
+        return await handler(event, data)
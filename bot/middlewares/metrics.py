@@ -0,0 +1,31 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.services.metrics import HANDLER_SECONDS, UPDATES_TOTAL
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Считает апдейты и время хендлеров по роутерам"""
+
+    def __init__(self, event_name: str):
+        self.event_name = event_name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        # Роутер = модуль хендлера: bot.handlers.download -> download
+        handler_object = data.get("handler")
+        router = (
+            handler_object.callback.__module__.rsplit(".", 1)[-1]
+            if handler_object
+            else "unknown"
+        )
+
+        UPDATES_TOTAL.inc(router=router, event=self.event_name)
+        with HANDLER_SECONDS.time(router=router):
+            return await handler(event, data)
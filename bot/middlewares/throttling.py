@@ -0,0 +1,168 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, InlineQuery, Message, TelegramObject
+
+from bot.config import (
+    ADMIN_IDS,
+    THROTTLE_DOWNLOAD,
+    THROTTLE_GLOBAL_DOWNLOAD,
+    THROTTLE_GLOBAL_METADATA,
+    THROTTLE_MESSAGE,
+    THROTTLE_METADATA,
+)
+from bot.services.metrics import THROTTLED_REQUESTS
+
+
+class RateLimit(NamedTuple):
+    rate: float  # токенов в секунду
+    burst: int  # размер "пачки" запросов подряд
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+    def consume(self, limit: RateLimit, now: float) -> float:
+        """Взять токен: 0, если можно, иначе сколько секунд ждать"""
+        self.tokens = min(limit.burst, self.tokens + (now - self.updated) * limit.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / limit.rate
+
+
+# Лимиты на пользователя по видам запросов. Вид задаётся флагом хендлера
+# flags={"throttle": "metadata"}; каждое сообщение дополнительно тратит "message"
+USER_LIMITS = {
+    "message": RateLimit(*THROTTLE_MESSAGE),
+    "metadata": RateLimit(*THROTTLE_METADATA),
+    "download": RateLimit(*THROTTLE_DOWNLOAD),
+}
+GLOBAL_LIMITS = {
+    "metadata": RateLimit(*THROTTLE_GLOBAL_METADATA),
+    "download": RateLimit(*THROTTLE_GLOBAL_DOWNLOAD),
+}
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты запросов (token bucket на пользователя и общий).
+
+    Регистрируется как inner middleware, чтобы видеть флаги хендлера:
+    отказ происходит до любой работы yt-dlp.
+    """
+
+    def __init__(self, evict_interval: float = 300):
+        self.user_buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        self.global_buckets: Dict[str, TokenBucket] = {}
+        # Пользователи, которых уже предупредили: user_id -> до какого времени молчим
+        self.warned_until: Dict[int, float] = {}
+        self.evict_interval = evict_interval
+        self.last_evict = time.monotonic()
+
+    def _check(self, kind: str, user_id: int, now: float) -> Tuple[float, str]:
+        limit = USER_LIMITS.get(kind)
+        if limit is None:
+            return 0.0, ""
+
+        key = (kind, user_id)
+        bucket = self.user_buckets.get(key)
+        if bucket is None:
+            bucket = self.user_buckets[key] = TokenBucket(limit.burst, now)
+
+        wait = bucket.consume(limit, now)
+        if wait:
+            return wait, "user"
+
+        global_limit = GLOBAL_LIMITS.get(kind)
+        if global_limit:
+            global_bucket = self.global_buckets.get(kind)
+            if global_bucket is None:
+                global_bucket = self.global_buckets[kind] = TokenBucket(
+                    global_limit.burst, now
+                )
+
+            wait = global_bucket.consume(global_limit, now)
+            if wait:
+                bucket.tokens += 1  # Пользователь не виноват — возвращаем токен
+                return wait, "global"
+
+        return 0.0, ""
+
+    def _evict(self, now: float):
+        """Удалить вёдра, которые уже полностью наполнились: они равны новым"""
+        self.user_buckets = {
+            key: bucket
+            for key, bucket in self.user_buckets.items()
+            if now - bucket.updated
+            < USER_LIMITS[key[0]].burst / USER_LIMITS[key[0]].rate
+        }
+        self.warned_until = {
+            user_id: until
+            for user_id, until in self.warned_until.items()
+            if until > now
+        }
+        self.last_evict = now
+
+    async def _reject(
+        self, event: TelegramObject, user_id: int, wait: float, scope: str, now: float
+    ):
+        if isinstance(event, CallbackQuery):
+            # На callback всё равно нужно ответить, иначе у кнопки крутятся "часики"
+            await event.answer(
+                f"⏳ Слишком часто. Подождите {wait:.0f} с", show_alert=False
+            )
+            return
+
+        if isinstance(event, InlineQuery):
+            return
+
+        # Предупреждаем один раз за период, чтобы флуд не стоил нам запросов к API
+        if self.warned_until.get(user_id, 0) > now:
+            return
+        self.warned_until[user_id] = now + max(wait, 5)
+
+        if isinstance(event, Message):
+            text = (
+                "⚠️ Бот сейчас перегружен, попробуйте через минуту."
+                if scope == "global"
+                else f"⏳ Слишком много запросов. Подождите {wait:.0f} с."
+            )
+            await event.answer(text)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or user.id in ADMIN_IDS:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now - self.last_evict > self.evict_interval:
+            self._evict(now)
+
+        kinds = []
+        if isinstance(event, Message):
+            kinds.append("message")
+        flag: Optional[str] = get_flag(data, "throttle")
+        if flag:
+            kinds.append(flag)
+
+        for kind in kinds:
+            wait, scope = self._check(kind, user.id, now)
+            if wait:
+                THROTTLED_REQUESTS.inc(kind=kind, scope=scope)
+                await self._reject(event, user.id, wait, scope, now)
+                return None
+
+        return await handler(event, data)
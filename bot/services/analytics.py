@@ -0,0 +1,121 @@
+import csv
+import html
+import io
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+from bot.database.repository import (
+    get_daily_stats,
+    get_download_count,
+    get_hourly_stats,
+    get_monthly_active_users,
+    get_resolution_stats,
+    get_top_videos,
+    get_user_count,
+)
+from bot.services.youtube import ANIMATION_MODE, AUDIO_MODE
+
+# Все запросы читают сводные таблицы (bot/database/models.py, _init_rollups),
+# а не downloads: время не растёт с числом загрузок
+TOP_VIDEOS = 10
+DAILY_DAYS = 7
+SPARK_BARS = "▁▂▃▄▅▆▇█"
+
+
+def _sparkline(values: List[int]) -> str:
+    peak = max(values) or 1
+    return "".join(
+        SPARK_BARS[round(value / peak * (len(SPARK_BARS) - 1))] for value in values
+    )
+
+
+def _hourly_series(hours: int = 24) -> List[int]:
+    """Загрузки по часам, включая пустые часы"""
+    counts = {row["hour"]: row["downloads"] for row in get_hourly_stats(hours)}
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return [
+        counts.get((now - timedelta(hours=offset)).strftime("%Y-%m-%d %H:00"), 0)
+        for offset in reversed(range(hours))
+    ]
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _resolution_name(resolution: str) -> str:
+    if resolution == AUDIO_MODE:
+        return "аудио"
+    if resolution == ANIMATION_MODE:
+        return "GIF"
+    return f"{resolution}p" if resolution != "?" else "не указано"
+
+
+def build_stats_text() -> str:
+    """Текст раздела статистики в админке (HTML)"""
+    users_count = get_user_count()
+    downloads_count = get_download_count()
+    avg_per_user = downloads_count / users_count if users_count > 0 else 0
+
+    hourly = _hourly_series()
+    daily = get_daily_stats(DAILY_DAYS)
+    today = daily[-1] if daily and daily[-1]["day"] == _today() else None
+
+    lines = [
+        "📊 <b>СТАТИСТИКА</b>\n",
+        f"👥 Всего пользователей: <b>{users_count}</b>",
+        f"📥 Всего загрузок: <b>{downloads_count}</b>",
+        f"📈 Среднее на пользователя: <b>{avg_per_user:.2f}</b>\n",
+        f"👤 DAU: <b>{today['active_users'] if today else 0}</b>, "
+        f"MAU: <b>{get_monthly_active_users()}</b>",
+        f"🕐 За 24 часа: <b>{sum(hourly)}</b> загрузок",
+        f"<code>{_sparkline(hourly)}</code>\n",
+        "📅 <b>По дням</b> (UTC):",
+    ]
+    for row in daily:
+        lines.append(
+            f"{row['day'][5:]} — {row['downloads']} загр., "
+            f"{row['active_users']} активных"
+        )
+
+    resolutions = get_resolution_stats()
+    total = sum(row["downloads"] for row in resolutions) or 1
+    mix = ", ".join(
+        f"{_resolution_name(row['resolution'])} {row['downloads'] / total:.0%}"
+        for row in resolutions
+    )
+    lines.append(f"\n🎚 <b>Форматы:</b> {mix or 'нет данных'}")
+
+    lines.append(f"\n🏆 <b>Топ-{TOP_VIDEOS} видео:</b>")
+    for position, row in enumerate(get_top_videos(TOP_VIDEOS), 1):
+        title = row["title"] or row["video_url"] or row["video_key"]
+        if len(title) > 40:
+            title = title[:39] + "…"
+        lines.append(f"{position}. {html.escape(title)} — {row['downloads']}")
+
+    return "\n".join(lines)
+
+
+def _to_csv(header: List[str], rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(tuple(row) for row in rows)
+    # BOM, чтобы Excel открыл UTF-8 с кириллицей без настройки
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+def export_csv() -> List[Tuple[str, bytes]]:
+    """Файлы выгрузки: (имя, содержимое) — статистика по дням и топ видео"""
+    return [
+        (
+            "daily_stats.csv",
+            _to_csv(["day", "downloads", "active_users"], get_daily_stats()),
+        ),
+        (
+            "top_videos.csv",
+            _to_csv(
+                ["video_id", "video_url", "title", "downloads"], get_top_videos(1000)
+            ),
+        ),
+    ]
@@ -0,0 +1,155 @@
+import asyncio
+import contextlib
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from bot.config import (
+    MAX_IN_FLIGHT_UPDATES,
+    MAX_WAITING_UPDATES,
+    OVERLOAD_LOOP_LAG,
+    OVERLOAD_QUEUE_DEPTH,
+)
+from bot.services.metrics import IN_FLIGHT_UPDATES, LOOP_LAG_SECONDS, WAITING_UPDATES
+
+# Приоритеты апдейтов по убыванию. "low" никогда не ждёт: его либо
+# обрабатываем сразу, либо отбрасываем
+PRIORITIES = ("high", "normal", "low")
+
+# Как часто замерять отставание цикла событий
+LAG_PROBE_SECONDS = 0.25
+
+
+class Backpressure:
+    """Ограничение числа апдейтов в обработке.
+
+    При поллинге aiogram запускает задачу на каждый апдейт, не дожидаясь
+    предыдущих: когда скачивания копятся, без ограничения растут число задач,
+    сообщений "⏳ Загрузка..." и задержка. Здесь апдейт получает слот, только
+    если в обработке меньше max_in_flight апдейтов. При перегрузке (очередь
+    скачиваний длиннее queue_depth_limit или цикл событий отстаёт больше
+    loop_lag_limit) слот получают только апдейты "high" — нажатия кнопок,
+    продолжающие уже начатую работу. Остальные ждут в порядке приоритета.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_waiting: int,
+        queue_depth_limit: int,
+        loop_lag_limit: float,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.queue_depth_limit = queue_depth_limit
+        self.loop_lag_limit = loop_lag_limit
+        self.in_flight = 0
+        self.waiters: Dict[str, Deque[asyncio.Future]] = {
+            priority: deque() for priority in PRIORITIES
+        }
+        self.loop_lag = 0.0
+        # Длина очереди скачиваний; задаётся в start(), когда созданы сервисы
+        self.queue_depth: Callable[[], int] = lambda: 0
+        self.monitor: Optional[asyncio.Task] = None
+
+        IN_FLIGHT_UPDATES.set_function(lambda: self.in_flight)
+        WAITING_UPDATES.set_function(lambda: self.waiting)
+        LOOP_LAG_SECONDS.set_function(lambda: self.loop_lag)
+
+    def start(self, queue_depth: Callable[[], int]):
+        self.queue_depth = queue_depth
+        if self.monitor is None:
+            self.monitor = asyncio.create_task(self._watch_loop())
+
+    async def stop(self):
+        if self.monitor:
+            self.monitor.cancel()
+            await asyncio.gather(self.monitor, return_exceptions=True)
+            self.monitor = None
+
+    async def _watch_loop(self):
+        """Замер отставания цикла событий; заодно будит ждущих, когда
+        перегрузка прошла без освобождения слотов"""
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(LAG_PROBE_SECONDS)
+            lag = time.monotonic() - started - LAG_PROBE_SECONDS
+            # Пик затухает за несколько замеров: один быстрый замер между
+            # долгими блокировками не снимает перегрузку
+            self.loop_lag = max(lag, self.loop_lag / 2)
+            self._wake()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self.waiters.values())
+
+    def overloaded(self) -> bool:
+        return (
+            self.queue_depth() >= self.queue_depth_limit
+            or self.loop_lag >= self.loop_lag_limit
+        )
+
+    def full(self) -> bool:
+        """Ждущих столько, что новые апдейты лучше отбросить"""
+        return self.waiting >= self.max_waiting
+
+    def position(self, priority: str) -> int:
+        """Какой по счёту будет новый апдейт этого приоритета"""
+        ahead = PRIORITIES[: PRIORITIES.index(priority) + 1]
+        return sum(len(self.waiters[p]) for p in ahead) + 1
+
+    def _can_enter(self, priority: str) -> bool:
+        if self.in_flight >= self.max_in_flight:
+            return False
+        return priority == "high" or not self.overloaded()
+
+    def try_acquire(self, priority: str) -> bool:
+        """Занять слот без ожидания; ждущих того же или высшего приоритета
+        не обгоняем"""
+        if self.position(priority) > 1 or not self._can_enter(priority):
+            return False
+        self.in_flight += 1
+        return True
+
+    async def acquire(
+        self,
+        priority: str,
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None,
+    ):
+        """Дождаться слота в очереди своего приоритета.
+
+        on_queued(позиция) вызывается сразу после постановки в очередь.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(future)
+        try:
+            if on_queued:
+                await on_queued(self.position(priority) - 1)
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Слот уже выдали, но задача завершилась до его использования
+                self.release()
+            else:
+                with contextlib.suppress(ValueError):
+                    self.waiters[priority].remove(future)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        for priority in PRIORITIES:
+            queue = self.waiters[priority]
+            while queue and self._can_enter(priority):
+                future = queue.popleft()
+                if future.done():
+                    continue
+                self.in_flight += 1
+                future.set_result(None)
+
+
+backpressure = Backpressure(
+    MAX_IN_FLIGHT_UPDATES, MAX_WAITING_UPDATES, OVERLOAD_QUEUE_DEPTH, OVERLOAD_LOOP_LAG
+)
@@ -1,4 +1,5 @@
 from bot.database.repository import get_all_users
+from bot.services.metrics import BROADCAST_MESSAGES
 
 
 class BroadcastService:
@@ -14,7 +15,9 @@ class BroadcastService:
             try:
                 await self.bot.send_message(user["user_id"], text)
                 success += 1
-            except Exception:
+                BROADCAST_MESSAGES.inc(result="ok")
+            except Exception as e:
                 failed += 1
+                BROADCAST_MESSAGES.inc(result="error", error=type(e).__name__)
 
         return success, failed
@@ -0,0 +1,190 @@
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Классы ошибок, которые говорят о том, что YouTube нас ограничивает
+FAILURE_CLASSES = ("403", "429", "extractor")
+
+
+class YouTubeUnavailableError(Exception):
+    """Площадка (YouTube, TikTok...) временно недоступна: выключатель разомкнут"""
+
+    def __init__(self, retry_after: float, source: str = "YouTube"):
+        self.retry_after = retry_after
+        minutes = max(1, round(retry_after / 60))
+        super().__init__(
+            f"⚠️ {source} временно ограничил запросы бота.\n\n"
+            f"Попробуйте через {minutes} мин."
+        )
+
+
+def classify_error(error: BaseException) -> str:
+    """Класс ошибки yt-dlp для выключателя"""
+    text = str(error)
+
+    if "429" in text or "Too Many Requests" in text:
+        return "429"
+    if "403" in text or "Forbidden" in text or "confirm you're not a bot" in text:
+        return "403"
+    # Удалённое или приватное видео — проблема ссылки, а не блокировка
+    if "unavailable" in text or "Private video" in text:
+        return "unavailable"
+    if type(error).__name__ in ("DownloadCancelled", "CancelledError"):
+        return "cancelled"
+    if "Extractor" in type(error).__name__ or "Unable to extract" in text:
+        return "extractor"
+    return "other"
+
+
+class CircuitBreaker:
+    """Выключатель: после серии 403/429 перестаём ходить на площадку.
+
+    closed    — всё работает, ошибки считаются в скользящем окне;
+    open      — запросы сразу отклоняются до open_until (backoff с jitter);
+    half_open — пропускаем один пробный запрос: успех замыкает, ошибка
+                снова размыкает с удвоенным backoff.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float,
+        min_failures: int,
+        failure_ratio: float,
+        base_backoff: float,
+        max_backoff: float,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_failures = min_failures
+        self.failure_ratio = failure_ratio
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.state = "closed"
+        self.events: Deque[Tuple[float, str]] = deque()
+        self.open_until = 0.0
+        self.trips = 0  # Сколько раз подряд размыкались — для роста backoff
+        self.probe_in_flight = False
+
+    def _trim(self, now: float):
+        while self.events and now - self.events[0][0] > self.window_seconds:
+            self.events.popleft()
+
+    def retry_after(self) -> float:
+        return max(0.0, self.open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        """Можно ли сейчас идти в YouTube"""
+        if self.state == "closed":
+            return True
+
+        if self.state == "open" and time.monotonic() >= self.open_until:
+            self.state = "half_open"
+            self.probe_in_flight = False
+            logger.info("Выключатель %s: пробный запрос", self.name)
+
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+
+        return False
+
+    def record(self, outcome: str):
+        """Записать результат запроса: "ok" или класс ошибки"""
+        # Ответы на запросы, начатые до размыкания, уже ничего не меняют
+        if self.state == "open":
+            return
+        if outcome in ("cancelled", "unavailable", "other") and self.state == "closed":
+            return
+
+        now = time.monotonic()
+
+        if self.state == "half_open":
+            self.probe_in_flight = False
+            if outcome == "ok":
+                self._close()
+            elif outcome in FAILURE_CLASSES:
+                self._open(now)
+            return
+
+        self.events.append((now, outcome))
+        self._trim(now)
+
+        failures = sum(1 for _, event in self.events if event in FAILURE_CLASSES)
+        if (
+            failures >= self.min_failures
+            and failures / len(self.events) >= self.failure_ratio
+        ):
+            self._open(now)
+
+    def _open(self, now: float):
+        backoff = min(self.max_backoff, self.base_backoff * 2**self.trips)
+        # Jitter, чтобы все инстансы не вернулись в YouTube одновременно
+        backoff *= random.uniform(0.5, 1.0)
+
+        self.state = "open"
+        self.open_until = now + backoff
+        self.trips += 1
+        self.events.clear()
+        logger.warning("Выключатель %s разомкнут на %.0f с", self.name, backoff)
+
+    def _close(self):
+        self.state = "closed"
+        self.trips = 0
+        self.events.clear()
+        logger.info("Выключатель %s снова замкнут", self.name)
+
+
+class Identity:
+    """Набор cookies/исходящий адрес, с которыми ходим на площадку"""
+
+    def __init__(
+        self,
+        cookie_file: Optional[str],
+        source_address: Optional[str],
+        breaker: CircuitBreaker,
+    ):
+        self.cookie_file = cookie_file
+        self.source_address = source_address
+        self.breaker = breaker
+
+    @property
+    def ydl_opts(self) -> dict:
+        opts = {}
+        if self.cookie_file:
+            opts["cookiefile"] = self.cookie_file
+        if self.source_address:
+            opts["source_address"] = self.source_address
+        return opts
+
+
+class IdentityPool:
+    """Ротация cookies и адресов: берём первый, чей выключатель пропускает.
+
+    У каждой площадки свой пул: блокировка на одной не мешает остальным.
+    """
+
+    def __init__(self, identities: List[Identity], source: str = "YouTube"):
+        self.identities = identities
+        self.source = source
+
+    @property
+    def open_count(self) -> int:
+        return sum(
+            1 for identity in self.identities if identity.breaker.state != "closed"
+        )
+
+    def acquire(self) -> Identity:
+        for identity in self.identities:
+            if identity.breaker.allow():
+                return identity
+
+        retry_after = min(
+            identity.breaker.retry_after() for identity in self.identities
+        )
+        raise YouTubeUnavailableError(retry_after, self.source)
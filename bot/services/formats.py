@@ -0,0 +1,130 @@
+import struct
+import sys
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+# Флаги формата
+VIDEO = 1  # Есть видеодорожка и известна высота
+SILENT = 2  # Без звука (acodec == "none"), звук нужно докачать отдельно
+AUDIO_ONLY = 4  # Только звук
+
+# Одна запись на формат: высота, коды кодеков, флаги, битрейт (кбит/с), размер
+_RECORD = struct.Struct("<HHHBfq")
+
+# Кодеки повторяются у всех видео: строка хранится в процессе один раз,
+# а в таблице форматов — её номер
+_codec_names: List[str] = []
+_codec_codes: Dict[str, int] = {}
+
+
+def codec_code(name: Optional[str]) -> int:
+    name = name or ""
+    code = _codec_codes.get(name)
+    if code is None:
+        code = len(_codec_names)
+        name = sys.intern(name)
+        _codec_names.append(name)
+        _codec_codes[name] = code
+    return code
+
+
+def codec_name(code: int) -> str:
+    return _codec_names[code]
+
+
+class Format(NamedTuple):
+    height: int
+    vcodec: str
+    acodec: str
+    flags: int
+    bitrate: float
+    size: int
+
+    def size_for(self, duration: int) -> int:
+        """Размер в байтах; если неизвестен — оценка по битрейту"""
+        if not self.size and self.bitrate and duration:
+            return int(self.bitrate * 1000 / 8 * duration)
+        return self.size
+
+
+class FormatTable:
+    """Форматы видео, упакованные в bytes (19 байт на формат).
+
+    yt-dlp отдаёт на каждый формат словарь из десятков ключей; боту из них
+    нужны только высота, кодеки, битрейт и размер. Форматы без видео и без
+    звука (раскадровки) не сохраняются.
+    """
+
+    __slots__ = ("_packed",)
+
+    def __init__(self, packed: bytes = b""):
+        self._packed = packed
+
+    @classmethod
+    def from_ytdlp(cls, formats: Iterable[dict]) -> "FormatTable":
+        records = []
+        for fmt in formats:
+            vcodec, acodec = fmt.get("vcodec"), fmt.get("acodec")
+            flags = 0
+            if fmt.get("height") and vcodec != "none":
+                flags |= VIDEO
+            if acodec == "none":
+                flags |= SILENT
+            if vcodec == "none" and acodec not in (None, "none"):
+                flags |= AUDIO_ONLY
+            if not flags & (VIDEO | AUDIO_ONLY):
+                continue
+
+            records.append(
+                _RECORD.pack(
+                    min(fmt.get("height") or 0, 0xFFFF),
+                    codec_code(vcodec),
+                    codec_code(acodec),
+                    flags,
+                    fmt.get("tbr") or 0,
+                    int(fmt.get("filesize") or fmt.get("filesize_approx") or 0),
+                )
+            )
+        return cls(b"".join(records))
+
+    def __len__(self) -> int:
+        return len(self._packed) // _RECORD.size
+
+    def __iter__(self) -> Iterator[Format]:
+        for height, vcodec, acodec, flags, bitrate, size in _RECORD.iter_unpack(
+            self._packed
+        ):
+            yield Format(
+                height, codec_name(vcodec), codec_name(acodec), flags, bitrate, size
+            )
+
+    def heights(self) -> List[int]:
+        """Доступные высоты видео по возрастанию"""
+        return sorted({fmt.height for fmt in self if fmt.flags & VIDEO})
+
+    def has_audio(self) -> bool:
+        """Есть звук: отдельная дорожка или видео со звуком"""
+        return any(fmt.flags & AUDIO_ONLY or not fmt.flags & SILENT for fmt in self)
+
+    def estimate_size(self, target_height: int, duration: int) -> int:
+        """Примерный размер видео в разрешении target_height вместе со звуком"""
+        videos = [fmt for fmt in self if fmt.flags & VIDEO]
+        if not videos:
+            return 0
+
+        # Тот же выбор, что и в _download_video: ближайшее разрешение, лучше со звуком
+        video = min(
+            videos,
+            key=lambda fmt: (abs(fmt.height - target_height), fmt.flags & SILENT),
+        )
+        size = video.size_for(duration)
+
+        if video.flags & SILENT:
+            size += max(
+                (fmt.size_for(duration) for fmt in self if fmt.flags & AUDIO_ONLY),
+                default=0,
+            )
+
+        return size
+
+
+EMPTY_FORMATS = FormatTable()
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import logging
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from bot.config import SHUTDOWN_DRAIN_SECONDS
+from bot.database.repository import add_pending_job, take_pending_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class TrackedJob:
+    """Работа, которую нельзя терять при перезапуске (скачивание, рассылка)"""
+
+    __slots__ = ("kind", "payload", "task")
+
+    def __init__(self, kind: str, payload: Dict[str, Any], task: asyncio.Task):
+        self.kind = kind
+        self.payload = payload  # Можно обновлять по ходу работы (прогресс)
+        self.task = task
+
+
+class Lifecycle:
+    """Остановка без потери работы.
+
+    aiogram по SIGTERM перестаёт получать апдейты и вызывает shutdown-хендлеры
+    до закрытия сессии бота. drain() в это время ждёт идущие задачи не дольше
+    drain_seconds, а оставшиеся сохраняет в базу и отменяет. Следующий процесс
+    в resume_pending() передаёт их зарегистрированным обработчикам.
+    """
+
+    def __init__(self, drain_seconds: float):
+        self.drain_seconds = drain_seconds
+        self.jobs: Set[TrackedJob] = set()
+        self.resumers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self._resumed_tasks: Set[asyncio.Task] = set()
+
+    def register_resumer(self, kind: str, resumer: Callable[..., Awaitable[Any]]):
+        """resumer(bot, payload, dispatcher) продолжит сохранённую работу вида kind"""
+        self.resumers[kind] = resumer
+
+    @contextmanager
+    def track(self, kind: str, payload: Dict[str, Any]):
+        job = TrackedJob(kind, payload, asyncio.current_task())
+        self.jobs.add(job)
+        try:
+            yield job
+        finally:
+            self.jobs.discard(job)
+
+    async def drain(self):
+        if not self.jobs:
+            return
+
+        logger.info("Остановка: ждём %s задач(и)", len(self.jobs))
+        await asyncio.wait({job.task for job in self.jobs}, timeout=self.drain_seconds)
+
+        unfinished = list(self.jobs)
+        for job in unfinished:
+            add_pending_job(job.kind, json.dumps(job.payload, ensure_ascii=False))
+            job.task.cancel()
+
+        if unfinished:
+            logger.warning(
+                "Не успели завершить %s задач(и), продолжим после перезапуска",
+                len(unfinished),
+            )
+            await asyncio.wait({job.task for job in unfinished}, timeout=5)
+
+    async def resume_pending(self, bot, dispatcher):
+        """Запустить в фоне работу, оставшуюся от предыдущего процесса.
+
+        Вызывается после создания сервисов: resumer берёт их из dispatcher.
+        """
+        for row in take_pending_jobs():
+            resumer = self.resumers.get(row["kind"])
+            if resumer is None:
+                logger.warning("Нет обработчика для задачи %s", row["kind"])
+                continue
+
+            logger.info("Продолжаем задачу %s после перезапуска", row["kind"])
+            task = asyncio.create_task(
+                resumer(bot, json.loads(row["payload"]), dispatcher)
+            )
+            self._resumed_tasks.add(task)
+            task.add_done_callback(self._resumed_tasks.discard)
+
+
+lifecycle = Lifecycle(SHUTDOWN_DRAIN_SECONDS)
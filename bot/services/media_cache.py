@@ -0,0 +1,127 @@
+import logging
+import os
+import re
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# Файлы {user_id}_{uuid}.*, оставшиеся после падений старых версий бота:
+# готовые видео и звук, а также промежуточные файлы yt-dlp
+# (.f137.mp4, .f140.m4a, .part, .temp.mp4)
+ORPHAN_PATTERN = re.compile(r"^\d+_[0-9a-f]{8}\..*")
+PARTIAL_MARKER = ".partial"
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """Кэш скачанных файлов на диске с LRU-вытеснением по размеру.
+
+    Файлы адресуются ключом "{video_id}_{format}", поэтому одно скачивание
+    переиспользуется разными чатами и повторными попытками отправки.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # key -> размер файла; порядок = от давно использованных к свежим
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.rebuild_index()
+
+    @staticmethod
+    def make_key(video_id: str, fmt: str) -> str:
+        return re.sub(r"[^\w-]", "_", f"{video_id}_{fmt}")
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.mp4"
+
+    def contains_path(self, path: str) -> bool:
+        return Path(path).resolve().parent == self.root.resolve()
+
+    def rebuild_index(self):
+        """Восстановить индекс по файлам на диске (при старте)"""
+        self.entries.clear()
+        self.total_bytes = 0
+        files = []
+
+        for path in self.root.iterdir():
+            if not path.is_file():
+                continue
+            # Недокачанные файлы после падения бота
+            if PARTIAL_MARKER in path.name:
+                path.unlink(missing_ok=True)
+                continue
+            if path.suffix == ".mp4":
+                stat = path.stat()
+                files.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+
+        self._evict()
+        logger.info(
+            "Медиа-кэш: %s файлов, %.1f MB",
+            len(self.entries),
+            self.total_bytes / (1024 * 1024),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Путь к файлу из кэша или None"""
+        if key not in self.entries:
+            return None
+
+        path = self._path(key)
+        if not path.exists():
+            self.total_bytes -= self.entries.pop(key)
+            return None
+
+        self.entries.move_to_end(key)
+        os.utime(path)  # mtime = время последнего использования для rebuild_index
+        return str(path)
+
+    def temp_path(self, key: str) -> Path:
+        """Временный путь для скачивания (.mp4 в конце нужен yt-dlp для merge)"""
+        return self.root / f"{key}.{uuid.uuid4().hex[:8]}{PARTIAL_MARKER}.mp4"
+
+    def put(self, key: str, temp_path: Path) -> str:
+        """Атомарно переместить скачанный файл в кэш"""
+        path = self._path(key)
+        os.replace(temp_path, path)
+
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)
+
+        size = path.stat().st_size
+        self.entries[key] = size
+        self.total_bytes += size
+
+        self._evict(keep=key)
+        return str(path)
+
+    def _evict(self, keep: Optional[str] = None):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key = next(iter(self.entries))
+            if key == keep:
+                break
+
+            size = self.entries.pop(key)
+            self.total_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+            logger.info("Вытеснен из кэша: %s (%.1f MB)", key, size / (1024 * 1024))
+
+
+def sweep_orphans(download_dir: Path) -> int:
+    """Удалить временные файлы, оставшиеся после падений"""
+    removed = 0
+    for path in Path(download_dir).iterdir():
+        if path.is_file() and ORPHAN_PATTERN.match(path.name):
+            path.unlink(missing_ok=True)
+            removed += 1
+
+    if removed:
+        logger.info("Удалено потерянных файлов: %s", removed)
+    return removed
@@ -0,0 +1,277 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик"""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Текущее значение; может считаться функцией в момент сбора"""
+
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function:
+            try:
+                return [f"{self.name} {self._function()}"]
+            except Exception as e:
+                logger.warning("Не удалось посчитать %s: %s", self.name, e)
+                return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    """Распределение значений (обычно длительностей в секундах)"""
+
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (счётчики по бакетам, сумма, количество)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Замерить блок кода; labels можно дополнить внутри блока"""
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (bucket_counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                bucket_labels = _format_labels(
+                    self.labelnames + ("le",), key + (str(bound),)
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+            inf_labels = _format_labels(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{inf_labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = Registry()
+
+UPDATES_TOTAL = registry.register(
+    Counter("bot_updates_total", "Обработанные апдейты", ["router", "event"])
+)
+HANDLER_SECONDS = registry.register(
+    Histogram("bot_handler_seconds", "Время работы хендлеров", ["router"])
+)
+VIDEO_INFO_SECONDS = registry.register(
+    Histogram("ytdlp_video_info_seconds", "Время get_video_info", ["status"])
+)
+DOWNLOAD_SECONDS = registry.register(
+    Histogram(
+        "ytdlp_download_seconds",
+        "Время _download_video",
+        ["status"],
+        buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+    )
+)
+MERGE_SECONDS = registry.register(
+    Histogram(
+        "ytdlp_merge_seconds",
+        "Время склейки видео и звука через ffmpeg",
+        buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+)
+DOWNLOADED_BYTES = registry.register(
+    Counter("bot_downloaded_bytes_total", "Скачано байт с площадок")
+)
+UPLOADED_BYTES = registry.register(
+    Counter("bot_uploaded_bytes_total", "Загружено байт в Telegram")
+)
+CACHE_REQUESTS = registry.register(
+    Counter("bot_cache_requests_total", "Обращения к кэшам", ["cache", "result"])
+)
+ACTIVE_DOWNLOADS = registry.register(
+    Gauge("bot_active_downloads", "Пользователи с идущей обработкой видео")
+)
+QUEUED_DOWNLOADS = registry.register(
+    Gauge("bot_queued_downloads", "Скачивания, ждущие в очереди (все полосы)")
+)
+DB_QUERY_SECONDS = registry.register(
+    Histogram("bot_db_query_seconds", "Время запросов к базе", ["query"])
+)
+BROADCAST_MESSAGES = registry.register(
+    Counter("bot_broadcast_messages_total", "Сообщения рассылки", ["result", "error"])
+)
+THROTTLED_REQUESTS = registry.register(
+    Counter("bot_throttled_total", "Отклонённые лимитом запросы", ["kind", "scope"])
+)
+YTDLP_ERRORS = registry.register(
+    Counter(
+        "ytdlp_errors_total",
+        "Ошибки yt-dlp по площадкам и классам",
+        ["source", "error"],
+    )
+)
+WARMED_ITEMS = registry.register(
+    Counter(
+        "warmer_items_total",
+        "Прогретые заранее популярные видео: info — метаданные, media — файл",
+        ["kind"],
+    )
+)
+OPEN_BREAKERS = registry.register(
+    Gauge(
+        "ytdlp_open_breakers",
+        "Наборы cookies/адресов (по всем площадкам) с разомкнутым выключателем",
+    )
+)
+
+IN_FLIGHT_UPDATES = registry.register(
+    Gauge("bot_in_flight_updates", "Апдейты, которые сейчас обрабатываются")
+)
+WAITING_UPDATES = registry.register(
+    Gauge("bot_waiting_updates", "Апдейты, отложенные из-за перегрузки")
+)
+LOOP_LAG_SECONDS = registry.register(
+    Gauge("bot_event_loop_lag_seconds", "Отставание цикла событий")
+)
+SHED_UPDATES = registry.register(
+    Counter(
+        "bot_shed_updates_total",
+        "Апдейты при перегрузке: deferred — ждали, dropped — отброшены",
+        ["event", "action"],
+    )
+)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def timed_query(function):
+    """Декоратор для функций репозитория: пишет время запроса"""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with DB_QUERY_SECONDS.time(query=function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Поднять HTTP-эндпоинт /metrics в формате Prometheus"""
+
+    async def metrics_handler(request: web.Request) -> web.Response:
+        return web.Response(
+            text=registry.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
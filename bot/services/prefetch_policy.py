@@ -0,0 +1,29 @@
+from typing import Optional, Sequence
+
+from bot.config import PREFETCH_DEFAULT_RESOLUTION, PREFETCH_MIN_SHARE, PREFETCH_POLICY
+from bot.database.repository import get_user_resolution_stats
+
+
+def choose_prefetch_resolution(
+    user_id: int, available_resolutions: Sequence[str]
+) -> Optional[str]:
+    """Угадать разрешение, которое пользователь скорее всего выберет.
+
+    Возвращает None, если предзагрузка выключена или уверенности мало.
+    """
+    if PREFETCH_POLICY == "off" or not available_resolutions:
+        return None
+
+    guess = PREFETCH_DEFAULT_RESOLUTION
+
+    if PREFETCH_POLICY == "history":
+        stats = get_user_resolution_stats(user_id)
+        total = sum(stats.values())
+
+        if total:
+            resolution, count = max(stats.items(), key=lambda item: item[1])
+            if count / total < PREFETCH_MIN_SHARE:
+                return None
+            guess = resolution
+
+    return guess if guess in available_resolutions else None
@@ -0,0 +1,126 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from aiogram.exceptions import TelegramRetryAfter
+
+
+@dataclass
+class ProgressEvent:
+    """Состояние скачивания для показа пользователю"""
+
+    stage: str  # "download" | "merge"
+    percent: Optional[float] = None
+    speed: Optional[float] = None  # байт/с
+    eta: Optional[int] = None  # секунды
+
+
+class ProgressChannel:
+    """Передача прогресса из потока yt-dlp в event loop.
+
+    Хранится только последнее событие: промежуточные никому не нужны,
+    если подписчик не успевает их показывать.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._latest: Optional[ProgressEvent] = None
+        self._changed = asyncio.Event()
+        self.closed = False
+
+    def publish(self, event: ProgressEvent):
+        """Отправить событие (можно вызывать из любого потока)"""
+        try:
+            self._loop.call_soon_threadsafe(self._set, event)
+        except RuntimeError:
+            pass  # event loop уже закрыт
+
+    def _set(self, event: ProgressEvent):
+        self._latest = event
+        self._changed.set()
+
+    def close(self):
+        self.closed = True
+        self._changed.set()
+
+    async def next(self) -> Optional[ProgressEvent]:
+        """Дождаться нового события, None после close()"""
+        await self._changed.wait()
+        self._changed.clear()
+        if self.closed:
+            return None
+        return self._latest
+
+
+def make_progress_hooks(publish: Callable[[ProgressEvent], None]):
+    """Хуки yt-dlp (progress_hooks, postprocessor_hooks), пишущие в publish"""
+
+    def on_progress(d):
+        if d.get("status") != "downloading":
+            return
+
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        downloaded = d.get("downloaded_bytes") or 0
+        publish(
+            ProgressEvent(
+                stage="download",
+                percent=downloaded * 100 / total if total else None,
+                speed=d.get("speed"),
+                eta=d.get("eta"),
+            )
+        )
+
+    def on_postprocess(d):
+        if d.get("status") == "started" and d.get("postprocessor") == "Merger":
+            publish(ProgressEvent(stage="merge"))
+
+    return on_progress, on_postprocess
+
+
+def format_progress(event: ProgressEvent, label: str) -> str:
+    """label — что скачиваем: видео 720p, аудио или GIF"""
+    if event.stage == "merge":
+        return f"⚙️ Склеиваю видео и звук ({label})..."
+
+    lines = [f"⏳ Скачиваю {label}..."]
+
+    if event.percent is not None:
+        filled = int(event.percent // 10)
+        lines.append(f"\n{'▓' * filled}{'░' * (10 - filled)} {event.percent:.0f}%")
+
+    details = []
+    if event.speed:
+        details.append(f"🚀 {event.speed / (1024 * 1024):.1f} MB/s")
+    if event.eta is not None:
+        details.append(f"⏱ {event.eta} с")
+    if details:
+        lines.append(" · ".join(details))
+
+    return "\n".join(lines)
+
+
+async def run_progress_reporter(
+    channel: ProgressChannel,
+    edit: Callable[[str], Awaitable],
+    label: str,
+    min_interval: float,
+):
+    """Показывать прогресс, редактируя сообщение не чаще раза в min_interval"""
+    last_text = None
+
+    while True:
+        event = await channel.next()
+        if event is None:
+            return
+
+        text = format_progress(event, label)
+        if text != last_text:
+            try:
+                await edit(text)
+                last_text = text
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except Exception:
+                pass  # Например, "message is not modified"
+
+        await asyncio.sleep(min_interval)
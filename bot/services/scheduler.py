@@ -0,0 +1,147 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Полосы по убыванию приоритета
+LANES = ("high", "normal", "low")
+
+
+@dataclass
+class Job:
+    func: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    # Площадка: у каждой свой лимит одновременных загрузок
+    source: Optional[str] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Контекст того, кто поставил задачу: в нём, например, идентификатор
+    # апдейта для логов. Иначе задача унаследует контекст _on_job_done
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+
+class DownloadScheduler:
+    """Очередь скачиваний с полосами приоритета.
+
+    Из очереди берётся задача с наименьшим "эффективным" номером полосы:
+    номер полосы минус время ожидания / aging_seconds. Поэтому задачи из
+    нижних полос со временем поднимаются и не голодают. Полоса "low"
+    не может занять все слоты — один всегда остаётся для коротких видео.
+    Задачи площадки, упёршейся в свой лимит (source_limits), пропускаются:
+    ждут в очереди, не занимая её слотов, и не задерживают другие площадки.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        aging_seconds: float,
+        source_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.workers = workers
+        self.aging_seconds = aging_seconds
+        self.source_limits = source_limits or {}
+        self.queues: Dict[str, Deque[Job]] = {lane: deque() for lane in LANES}
+        self.running: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.running_sources: Dict[str, int] = {}
+        self.lane_limits = {
+            "high": workers,
+            "normal": workers,
+            "low": max(1, workers - 1),
+        }
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    @property
+    def active(self) -> int:
+        return sum(self.running.values())
+
+    async def submit(
+        self,
+        lane: str,
+        func: Callable[[], Awaitable[Any]],
+        source: Optional[str] = None,
+    ) -> Any:
+        """Дождаться свободного слота и выполнить func() в нём"""
+        future = asyncio.get_running_loop().create_future()
+        self.queues[lane].append(Job(func=func, future=future, source=source))
+        self._dispatch()
+        return await future
+
+    def _source_free(self, source: Optional[str]) -> bool:
+        limit = self.source_limits.get(source)
+        return limit is None or self.running_sources.get(source, 0) < limit
+
+    def _first_ready(self, queue: Deque[Job]) -> Optional[int]:
+        """Индекс первой задачи, площадка которой не упёрлась в лимит"""
+        # Отменённые пока ждали в очереди — просто выбрасываем
+        while queue and queue[0].future.done():
+            queue.popleft()
+        for index, job in enumerate(queue):
+            if not job.future.done() and self._source_free(job.source):
+                return index
+        return None
+
+    def _pick_job(self, now: float) -> Optional[Tuple[str, int]]:
+        best = None
+        best_score = None
+
+        for lane_index, lane in enumerate(LANES):
+            if self.running[lane] >= self.lane_limits[lane]:
+                continue
+            queue = self.queues[lane]
+            index = self._first_ready(queue)
+            if index is None:
+                continue
+
+            score = lane_index - (now - queue[index].enqueued_at) / self.aging_seconds
+            if best_score is None or score < best_score:
+                best, best_score = (lane, index), score
+
+        return best
+
+    def _dispatch(self):
+        while self.active < self.workers:
+            picked = self._pick_job(time.monotonic())
+            if picked is None:
+                return
+
+            lane, index = picked
+            queue = self.queues[lane]
+            job = queue[index]
+            del queue[index]
+            waited = time.monotonic() - job.enqueued_at
+            if waited > 1:
+                logger.info("Задача из полосы %s ждала %.1f с", lane, waited)
+
+            self.running[lane] += 1
+            if job.source:
+                self.running_sources[job.source] = (
+                    self.running_sources.get(job.source, 0) + 1
+                )
+            task = asyncio.create_task(job.func(), context=job.context)
+            task.add_done_callback(
+                lambda t, lane=lane, job=job: self._on_job_done(lane, job, t)
+            )
+
+    def _on_job_done(self, lane: str, job: Job, task: asyncio.Task):
+        self.running[lane] -= 1
+        if job.source:
+            self.running_sources[job.source] -= 1
+
+        if not job.future.done():
+            if task.cancelled():
+                job.future.cancel()
+            elif task.exception():
+                job.future.set_exception(task.exception())
+            else:
+                job.future.set_result(task.result())
+        elif not task.cancelled():
+            task.exception()  # Ожидающий ушёл, но ошибку считаем полученной
+
+        self._dispatch()
@@ -0,0 +1,120 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from bot.config import ENABLED_SOURCES
+
+
+@dataclass(frozen=True)
+class Source:
+    """Площадка с короткими видео, откуда бот умеет скачивать.
+
+    Кэши, очередь и отправка общие для всех источников; от источника
+    зависят только распознавание ссылок, набор экстракторов yt-dlp и
+    лимиты (параллельность, выключатель — см. YouTubeDownloader).
+    """
+
+    name: str
+    title: str
+    # Ссылка целиком в тексте сообщения
+    link_pattern: re.Pattern
+    # ID видео в ссылке — первая группа
+    id_pattern: re.Pattern
+    # Экстракторы yt-dlp (регулярные выражения по IE_NAME)
+    extractors: Tuple[str, ...]
+    # Префикс ID в кэшах: ID разных площадок могут совпасть
+    id_prefix: str = ""
+
+    @property
+    def ydl_opts(self) -> dict:
+        # Иначе каждый YoutubeDL создаёт все ~1800 экстракторов (десятки мс)
+        return {"allowed_extractors": list(self.extractors)}
+
+    def find_link(self, text: str) -> Optional[str]:
+        match = self.link_pattern.search(text)
+        return match.group(0) if match else None
+
+    def video_id(self, url: str) -> Optional[str]:
+        match = self.id_pattern.search(url)
+        return f"{self.id_prefix}{match.group(1)}" if match else None
+
+
+KNOWN_SOURCES = {
+    source.name: source
+    for source in (
+        Source(
+            name="youtube",
+            title="YouTube Shorts",
+            link_pattern=re.compile(
+                r"(https?://)?(www\.)?(youtube\.com/shorts/|youtu\.be/shorts/)[^\s]+"
+            ),
+            id_pattern=re.compile(r"(?:shorts/|youtu\.be/|[?&]v=)([\w-]{11})"),
+            extractors=("youtube",),
+        ),
+        Source(
+            name="tiktok",
+            title="TikTok",
+            link_pattern=re.compile(
+                r"(https?://)?(((www|m)\.)?tiktok\.com/@[\w.-]+/video/\d+"
+                r"|(vm|vt)\.tiktok\.com/[\w-]+)[^\s]*"
+            ),
+            id_pattern=re.compile(r"(?:/video/|(?:vm|vt)\.tiktok\.com/)([\w-]+)"),
+            extractors=("tiktok", r"vm\.tiktok"),
+            id_prefix="tt_",
+        ),
+        Source(
+            name="instagram",
+            title="Instagram Reels",
+            link_pattern=re.compile(
+                r"(https?://)?(www\.)?instagram\.com/(reels?|p)/[\w-]+[^\s]*"
+            ),
+            id_pattern=re.compile(r"instagram\.com/(?:reels?|p)/([\w-]+)"),
+            extractors=("instagram",),
+            id_prefix="ig_",
+        ),
+        Source(
+            name="vk",
+            title="VK Клипы",
+            link_pattern=re.compile(
+                r"(https?://)?((www|m)\.)?(vk\.com|vkvideo\.ru)/"
+                r"(clips[^\s]*[?&]z=)?clip-?\d+_\d+[^\s]*"
+            ),
+            id_pattern=re.compile(r"clip(-?\d+_\d+)"),
+            extractors=("vk",),
+            id_prefix="vk_",
+        ),
+    )
+}
+
+for _name in ENABLED_SOURCES:
+    if _name not in KNOWN_SOURCES:
+        raise ValueError(f"❌ Неизвестный источник в ENABLED_SOURCES: {_name}")
+
+SOURCES: List[Source] = [KNOWN_SOURCES[name] for name in ENABLED_SOURCES]
+
+# Ссылка на любой из включённых источников
+LINK_PATTERN = re.compile(
+    "|".join(f"(?:{source.link_pattern.pattern})" for source in SOURCES)
+)
+
+
+def find_source(url: str) -> Optional[Source]:
+    """Источник, к которому относится ссылка"""
+    for source in SOURCES:
+        if source.link_pattern.search(url):
+            return source
+    return None
+
+
+def find_link(text: str) -> Optional[str]:
+    """Первая поддерживаемая ссылка в тексте"""
+    match = LINK_PATTERN.search(text)
+    return match.group(0) if match else None
+
+
+def sources_title() -> str:
+    """Список площадок для подсказок: "YouTube Shorts, TikTok и VK Клипы" """
+    titles = [source.title for source in SOURCES]
+    if len(titles) == 1:
+        return titles[0]
+    return f"{', '.join(titles[:-1])} и {titles[-1]}"
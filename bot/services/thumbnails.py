@@ -0,0 +1,69 @@
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+import aiohttp
+
+from bot.config import FILE_ID_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailCache:
+    """Кэш превью видео: Telegram file_id фото по ID видео.
+
+    Картинки скачиваются через одну общую HTTP-сессию с пулом соединений
+    и коротким таймаутом, чтобы медленный YouTube не задерживал ответ.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 3.0,
+        pool_size: int = 20,
+        max_file_ids: int = FILE_ID_CACHE_SIZE,
+    ):
+        # video_id -> file_id, давно не нужные вытесняются
+        self.file_ids: "OrderedDict[str, str]" = OrderedDict()
+        self.max_file_ids = max_file_ids
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.pool_size = pool_size
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессию создаём лениво: ей нужен запущенный event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+            )
+        return self._session
+
+    def get_file_id(self, video_id: Optional[str]) -> Optional[str]:
+        if not video_id:
+            return None
+        file_id = self.file_ids.get(video_id)
+        if file_id:
+            self.file_ids.move_to_end(video_id)
+        return file_id
+
+    def remember(self, video_id: Optional[str], file_id: str):
+        if video_id and file_id:
+            self.file_ids[video_id] = file_id
+            self.file_ids.move_to_end(video_id)
+            while len(self.file_ids) > self.max_file_ids:
+                self.file_ids.popitem(last=False)
+
+    async def fetch(self, url: str) -> Optional[bytes]:
+        """Скачать картинку превью, None при ошибке или таймауте"""
+        try:
+            async with self._get_session().get(url) as response:
+                if response.status != 200:
+                    return None
+                return await response.read()
+        except Exception as e:
+            logger.warning("Не удалось скачать превью: %s", e)
+            return None
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
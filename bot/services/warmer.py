@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional, Tuple
+
+from aiogram.types import FSInputFile
+
+from bot.config import (
+    STORAGE_CHAT_ID,
+    WARMER_INTERVAL,
+    WARMER_MAX_MB_PER_HOUR,
+    WARMER_MEDIA,
+    WARMER_MIN_REQUESTS,
+    WARMER_TIME_SHARE,
+    WARMER_TOP,
+    WARMER_WINDOW_HOURS,
+)
+from bot.database.repository import get_hot_videos
+from bot.services.circuit_breaker import YouTubeUnavailableError
+from bot.services.media_cache import MediaCache
+from bot.services.metrics import WARMED_ITEMS
+from bot.services.youtube import ANIMATION_MODE, YouTubeDownloader
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять, освободилась ли очередь
+IDLE_POLL_SECONDS = 5
+
+
+class CacheWarmer:
+    """Фоновый прогрев популярных видео.
+
+    Раз в WARMER_INTERVAL секунд берёт из downloads видео, которые чаще всего
+    скачивали за последние WARMER_WINDOW_HOURS часов, и заранее получает для
+    них информацию (общий кэш YouTubeDownloader), а при WARMER_MEDIA — и файл:
+    в медиа-кэш на диске или, если задан STORAGE_CHAT_ID, сразу file_id.
+    Следующий пользователь получает такое видео без обращения к площадке.
+
+    Прогрев уступает живым запросам: ждёт, пока очередь скачиваний пуста,
+    скачивает в полосе "low", не выходит за трафик WARMER_MAX_MB_PER_HOUR
+    и после каждого шага отдыхает так, чтобы занимать не больше
+    WARMER_TIME_SHARE времени.
+    """
+
+    def __init__(self, youtube_service: YouTubeDownloader, bot):
+        self.youtube_service = youtube_service
+        self.bot = bot
+        self.task: Optional[asyncio.Task] = None
+        # (время, байты) скачанного прогревом за последний час
+        self.traffic: Deque[Tuple[float, int]] = deque()
+
+    def start(self):
+        if WARMER_INTERVAL and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(WARMER_INTERVAL)
+            try:
+                await self.warm_once()
+            except YouTubeUnavailableError as e:
+                logger.info("Прогрев пропущен: %s", e)
+            except Exception as e:
+                logger.exception("Ошибка прогрева кэша: %s", e)
+
+    def _busy(self) -> bool:
+        """Живая очередь занята: есть ожидающие или заняты полслота"""
+        scheduler = self.youtube_service.scheduler
+        return scheduler.queued > 0 or scheduler.active >= max(
+            1, scheduler.workers // 2
+        )
+
+    def _traffic_left(self) -> float:
+        now = time.monotonic()
+        while self.traffic and now - self.traffic[0][0] > 3600:
+            self.traffic.popleft()
+        spent = sum(size for _, size in self.traffic)
+        return WARMER_MAX_MB_PER_HOUR * 1024 * 1024 - spent
+
+    async def _step(self, func: Callable[[], Awaitable[Any]]):
+        """Выполнить шаг прогрева в свободное время и выдержать долю времени"""
+        while self._busy():
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+
+        started = time.monotonic()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # Остановка бота: паузу не выдерживаем, иначе она задержит выход
+            raise
+        except Exception:
+            await self._pause(started)
+            raise
+        await self._pause(started)
+        return result
+
+    @staticmethod
+    async def _pause(started: float):
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(elapsed * (1 / WARMER_TIME_SHARE - 1))
+
+    async def warm_once(self):
+        hot = get_hot_videos(WARMER_WINDOW_HOURS, WARMER_MIN_REQUESTS, WARMER_TOP)
+        warmed_info = set()
+
+        for row in hot:
+            try:
+                await self._warm_item(row, warmed_info)
+            except YouTubeUnavailableError:
+                # Площадка недоступна — остальное тоже не прогреется
+                raise
+            except Exception as e:
+                # Удалённое или закрытое видео не должно останавливать весь проход
+                logger.warning("Прогрев %s не удался: %s", row["video_url"], e)
+
+    async def _warm_item(self, row, warmed_info: set):
+        video_id, url, resolution = (
+            row["video_id"],
+            row["video_url"],
+            row["resolution"],
+        )
+
+        if video_id not in warmed_info:
+            warmed_info.add(video_id)
+            if not self.youtube_service.cached_video_info(url):
+                await self._step(lambda: self.youtube_service.load_video_info(url))
+                WARMED_ITEMS.inc(kind="info")
+
+        # GIF делается из видео локально, прогревать его отдельно незачем
+        if not WARMER_MEDIA or not resolution or resolution == ANIMATION_MODE:
+            return
+        if self._is_media_ready(video_id, resolution):
+            return
+        if self._traffic_left() <= 0:
+            logger.info("Прогрев: исчерпан бюджет трафика на час")
+            return
+
+        await self._step(lambda: self._warm_media(url, resolution))
+        WARMED_ITEMS.inc(kind="media")
+
+    @staticmethod
+    def _wants_file_id(resolution: str) -> bool:
+        # Без служебного чата file_id не получить; аудио туда не загружаем
+        return bool(STORAGE_CHAT_ID) and resolution.isdigit()
+
+    def _is_media_ready(self, video_id: str, resolution: str) -> bool:
+        if self.youtube_service.get_cached_file_id(video_id, resolution):
+            return True
+        if self._wants_file_id(resolution):
+            return False
+        return bool(
+            self.youtube_service.media_cache.get(
+                MediaCache.make_key(video_id, resolution)
+            )
+        )
+
+    async def _warm_media(self, url: str, resolution: str):
+        if not self._wants_file_id(resolution):
+            # Файл остаётся в медиа-кэше на диске
+            video_path = await self.youtube_service.download_to_cache(url, resolution)
+            self._count_traffic(video_path)
+            return
+
+        await self.youtube_service.prefetch(
+            url, resolution, publish=self._publish, lane="low"
+        )
+
+    async def _publish(self, video_path: str) -> str:
+        """Загрузить видео в служебный чат и вернуть его file_id"""
+        self._count_traffic(video_path)
+        message = await self.bot.send_video(
+            STORAGE_CHAT_ID, video=FSInputFile(video_path), supports_streaming=False
+        )
+        return message.video.file_id
+
+    def _count_traffic(self, video_path: str):
+        if video_path and os.path.exists(video_path):
+            self.traffic.append((time.monotonic(), os.path.getsize(video_path)))
@@ -1,24 +1,204 @@
 import asyncio
+import logging
 import os
+import threading
+import time
 import uuid
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from itertools import product
 from pathlib import Path
-from typing import Dict, List, Optional
-
-import yt_dlp
-
-from bot.database.repository import add_download_stat
-
-
-@dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from bot.config import (
+    ADMIN_IDS,
+    BREAKER_BASE_BACKOFF,
+    BREAKER_FAILURE_RATIO,
+    BREAKER_MAX_BACKOFF,
+    BREAKER_MIN_FAILURES,
+    BREAKER_WINDOW_SECONDS,
+    COOKIE_FILES,
+    DOWNLOAD_TIMEOUT,
+    DOWNLOAD_WORKERS,
+    ANIMATION_FPS,
+    ANIMATION_HEIGHT,
+    ANIMATION_MAX_SECONDS,
+    EXTRACT_TIMEOUT,
+    FFMPEG_PATH,
+    FILE_ID_CACHE_SIZE,
+    HEAVY_VIDEO_MB,
+    HEAVY_VIDEO_SECONDS,
+    INFO_CACHE_SECONDS,
+    INFO_CACHE_SIZE,
+    LANE_AGING_SECONDS,
+    MEDIA_CACHE_MAX_MB,
+    PREFETCH_MAX_CONCURRENT,
+    SHORT_VIDEO_SECONDS,
+    SOURCE_ADDRESSES,
+    SOURCE_BASE_BACKOFF,
+    SOURCE_MAX_CONCURRENT,
+    YTDLP_SOCKET_TIMEOUT,
+)
+from bot.database.repository import (
+    add_download_stat,
+    find_file_id,
+    has_downloads,
+    set_download_file_id,
+)
+from bot.services.circuit_breaker import (
+    CircuitBreaker,
+    Identity,
+    IdentityPool,
+    YouTubeUnavailableError,
+    classify_error,
+)
+from bot.services.formats import EMPTY_FORMATS, FormatTable
+from bot.services.media_cache import MediaCache, sweep_orphans
+from bot.services.metrics import (
+    ACTIVE_DOWNLOADS,
+    DOWNLOAD_SECONDS,
+    DOWNLOADED_BYTES,
+    MERGE_SECONDS,
+    QUEUED_DOWNLOADS,
+    OPEN_BREAKERS,
+    VIDEO_INFO_SECONDS,
+    YTDLP_ERRORS,
+    cache_lookup,
+)
+from bot.services.progress import ProgressChannel, ProgressEvent, make_progress_hooks
+from bot.services.scheduler import DownloadScheduler
+from bot.services.sources import SOURCES, Source, find_source, sources_title
+from bot.utils.log import YtDlpLogger
+from bot.utils.tracing import log_span, span
+
+# yt-dlp импортируется при первом скачивании (импорт в функциях):
+# он тяжёлый, а процессу без загрузок (админка, бенчмарк старта) не нужен
+if TYPE_CHECKING:
+    import yt_dlp
+
+logger = logging.getLogger(__name__)
+
+# Режимы вывода, кроме видео в разрешении: передаются вместо разрешения
+AUDIO_MODE = "audio"
+ANIMATION_MODE = "gif"
+# Только звук: самая лёгкая дорожка (сортировка AUDIO_FORMAT_SORT), лучше AAC —
+# она кладётся в m4a без перекодирования. Если отдельных дорожек нет (TikTok,
+# VK), берём видео со звуком; звук из него извлекает FFmpegExtractAudio
+AUDIO_FORMAT = "bestaudio[ext=m4a]/bestaudio/best"
+AUDIO_FORMAT_SORT = ["+size", "+br"]
+
+# Звук, который кладётся в MP4 без перекодирования (AAC); иначе — любой лучший
+MP4_AUDIO = ("bestaudio[ext=m4a]", "bestaudio[acodec^=mp4a]", "bestaudio")
+
+UNSUPPORTED_LINK_ERROR = (
+    f"Ссылка не поддерживается.\n\nПоддерживаются: {sources_title()}"
+)
+
+
+def format_label(resolution: Optional[str]) -> str:
+    """Подпись формата для сообщений: видео 720p, аудио, GIF"""
+    if resolution == AUDIO_MODE:
+        return "аудио"
+    if resolution == ANIMATION_MODE:
+        return "GIF"
+    return f"видео {resolution}p" if resolution else "видео"
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """Достать ID видео из ссылки (у не-YouTube — с префиксом площадки)"""
+    source = find_source(url)
+    return source.video_id(url) if source else None
+
+
+@dataclass(frozen=True, slots=True)
 class VideoInfo:
-    """Информация о видео"""
+    """Информация о видео.
+
+    Хранится в кэше информации (до INFO_CACHE_SIZE записей), поэтому
+    компактная: без __dict__, разрешения — кортеж общих строк, форматы —
+    упакованная таблица вместо словарей yt-dlp.
+    """
 
     url: str
     title: str
     thumbnail: str
     duration: int
-    available_resolutions: List[str]
+    available_resolutions: Tuple[str, ...]
+    video_id: Optional[str] = None
+    formats: FormatTable = EMPTY_FORMATS
+
+    @property
+    def audio_available(self) -> bool:
+        """Можно ли скачать только звук (из дорожки или из видео со звуком)"""
+        return self.formats.has_audio()
+
+    def estimated_size(self, resolution: Optional[str]) -> int:
+        """Оценка размера файла в байтах (для выбора полосы очереди)"""
+        if not resolution or not resolution.isdigit():
+            return 0
+        return self.formats.estimate_size(int(resolution), self.duration)
+
+
+# Разрешения, которые предлагаем пользователю
+STANDARD_RESOLUTIONS = ("480", "720")
+FALLBACK_RESOLUTIONS = ("360", "480", "720")
+
+
+def make_video_info(url: str, info: dict) -> VideoInfo:
+    """Собрать VideoInfo из ответа extract_info"""
+    formats = FormatTable.from_ytdlp(info.get("formats", []))
+
+    # Получаем доступные разрешения
+    available_resolutions = formats.heights()
+    logger.info("Доступные разрешения: %s", available_resolutions)
+
+    # Фильтруем стандартные разрешения
+    display_resolutions = tuple(
+        res
+        for res in STANDARD_RESOLUTIONS
+        if any(int(res) <= ar for ar in available_resolutions)
+    )
+
+    if not display_resolutions:
+        display_resolutions = FALLBACK_RESOLUTIONS
+
+    return VideoInfo(
+        url=url,
+        title=info.get("title", "Без названия"),
+        thumbnail=info.get("thumbnail", ""),
+        duration=info.get("duration") or 0,
+        available_resolutions=display_resolutions,
+        # ID из ссылки: с префиксом площадки, как в ключах кэшей
+        video_id=extract_video_id(url) or info.get("id"),
+        formats=formats,
+    )
+
+
+@dataclass
+class SpeculativeDownload:
+    """Предзагрузка разрешения, которое пользователь скорее всего выберет"""
+
+    resolution: str
+    task: asyncio.Task
+    cancel_event: threading.Event
+
+
+@dataclass
+class UserDownload:
+    """Идущее скачивание пользователя, которое можно отменить кнопкой"""
+
+    task: asyncio.Task
+    cancel_event: threading.Event
 
 
 class DownloadResult:
@@ -28,45 +208,485 @@ class DownloadResult:
         video_path: Optional[str] = None,
         error: Optional[str] = None,
         video_info: Optional[VideoInfo] = None,
+        file_id: Optional[str] = None,
+        download_id: Optional[int] = None,
     ):
         self.success = success
         self.video_path = video_path
         self.error = error
         self.video_info = video_info
+        self.file_id = file_id  # Уже загруженное в Telegram видео
+        self.download_id = download_id  # Запись в истории загрузок
 
 
 class YouTubeDownloader:
+    """Скачивание с YouTube Shorts и других площадок из bot/services/sources.py.
+
+    Кэши, очередь и отправка общие; у каждой площадки свои выключатели
+    и лимит одновременных загрузок.
+    """
+
     def __init__(self, download_dir: str = "downloads"):
         self.download_dir = Path(download_dir)
         self.download_dir.mkdir(exist_ok=True)
+        sweep_orphans(self.download_dir)
+        self.media_cache = MediaCache(
+            self.download_dir / "cache", max_bytes=MEDIA_CACHE_MAX_MB * 1024 * 1024
+        )
         self.active_downloads: Dict[int, bool] = {}
         self.video_cache: Dict[int, VideoInfo] = {}
+        # Общая для всех пользователей информация о видео: video_id -> (до, info)
+        self.info_cache: "OrderedDict[str, Tuple[float, VideoInfo]]" = OrderedDict()
+        # Telegram file_id уже отправленных видео: "{video_id}:{resolution}" -> file_id,
+        # последние FILE_ID_CACHE_SIZE; остальные находятся в истории загрузок
+        self.file_id_cache: "OrderedDict[str, str]" = OrderedDict()
+        # Фоновые загрузки (inline-режим): "{video_id}:{resolution}" -> Task[file_id]
+        self.prefetch_tasks: Dict[str, asyncio.Task] = {}
+        # Спекулятивные загрузки по пользователям
+        self.speculative_downloads: Dict[int, SpeculativeDownload] = {}
+        # Флаги отмены идущих фоновых загрузок (предзагрузки и прогрев)
+        self.background_cancels: Set[threading.Event] = set()
+        self.prefetch_semaphore = asyncio.Semaphore(PREFETCH_MAX_CONCURRENT)
+        # Куда отправлять прогресс скачивания пользователя
+        self.progress_channels: Dict[int, ProgressChannel] = {}
+        # Скачивания, которые пользователь ждёт прямо сейчас
+        self.user_downloads: Dict[int, UserDownload] = {}
+        # После остановки фоновые загрузки больше не запускаются
+        self.closing = False
+        # Лимит загрузок с площадки: пачка ссылок с одной площадки не занимает
+        # все слоты, а её задачи ждут в очереди с учётом полос приоритета
+        self.scheduler = DownloadScheduler(
+            workers=DOWNLOAD_WORKERS,
+            aging_seconds=LANE_AGING_SECONDS,
+            source_limits={
+                source.name: int(
+                    SOURCE_MAX_CONCURRENT.get(source.name, DOWNLOAD_WORKERS)
+                )
+                for source in SOURCES
+            },
+        )
+
+        ACTIVE_DOWNLOADS.set_function(lambda: sum(self.active_downloads.values()))
+        QUEUED_DOWNLOADS.set_function(lambda: self.scheduler.queued)
         self.cookies_path = Path(__file__).parent.parent.parent / "cookies.txt"
+        self.identities: Dict[str, IdentityPool] = {
+            source.name: self._make_identities(source) for source in SOURCES
+        }
+        OPEN_BREAKERS.set_function(
+            lambda: sum(pool.open_count for pool in self.identities.values())
+        )
+
+    def _make_identities(self, source: Source) -> IdentityPool:
+        """Наборы cookies × исходящих адресов площадки, у каждого свой выключатель"""
+        cookie_files: List[Optional[str]] = list(COOKIE_FILES)
+        if not cookie_files:
+            # По умолчанию — cookies.txt в корне проекта, если он есть
+            cookie_files = [
+                (
+                    str(self.cookies_path.absolute())
+                    if self.cookies_path.exists()
+                    else None
+                )
+            ]
+        source_addresses: List[Optional[str]] = list(SOURCE_ADDRESSES) or [None]
+
+        identities = []
+        for cookie_file, source_address in product(cookie_files, source_addresses):
+            name = "/".join(
+                filter(
+                    None,
+                    (
+                        source.name,
+                        cookie_file and Path(cookie_file).name,
+                        source_address,
+                    ),
+                )
+            )
+            breaker = CircuitBreaker(
+                name,
+                window_seconds=BREAKER_WINDOW_SECONDS,
+                min_failures=BREAKER_MIN_FAILURES,
+                failure_ratio=BREAKER_FAILURE_RATIO,
+                base_backoff=SOURCE_BASE_BACKOFF.get(source.name, BREAKER_BASE_BACKOFF),
+                max_backoff=BREAKER_MAX_BACKOFF,
+            )
+            identities.append(Identity(cookie_file, source_address, breaker))
+
+        return IdentityPool(identities, source.title)
 
     def is_user_downloading(self, user_id: int) -> bool:
         return self.active_downloads.get(user_id, False)
 
+    def choose_lane(
+        self, user_id: int, video_info: VideoInfo, resolution: Optional[str]
+    ) -> str:
+        """Полоса очереди для скачивания: короткие видео и админы — вперёд"""
+        if user_id in ADMIN_IDS:
+            return "high"
+
+        size = video_info.estimated_size(resolution)
+        if (
+            video_info.duration > HEAVY_VIDEO_SECONDS
+            or size > HEAVY_VIDEO_MB * 1024 * 1024
+        ):
+            return "low"
+
+        if video_info.duration <= SHORT_VIDEO_SECONDS:
+            return "high"
+
+        # Средние видео постоянных пользователей тоже обслуживаем быстрее
+        return "high" if has_downloads(user_id) else "normal"
+
+    async def _scheduled_download(
+        self,
+        lane: str,
+        url: str,
+        user_id: int,
+        resolution: Optional[str] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> str:
+        source = find_source(url)
+        return await self.scheduler.submit(
+            lane,
+            lambda: self._download_video(url, user_id, resolution, cancel_event),
+            source=source.name if source else None,
+        )
+
+    def _publish_progress(self, user_id: int, event: ProgressEvent):
+        # Вызывается из потока yt-dlp. Канал ищем в момент события, поэтому
+        # предзагрузка тоже показывает прогресс, как только пользователь её дождался
+        channel = self.progress_channels.get(user_id)
+        if channel:
+            channel.publish(event)
+
+    @staticmethod
+    def _cache_key(video_id: str, resolution: str) -> str:
+        return f"{video_id}:{resolution}"
+
+    def get_cached_file_id(
+        self, video_id: Optional[str], resolution: str
+    ) -> Optional[str]:
+        """Получить file_id ранее отправленного видео.
+
+        Сначала из памяти, потом из истории загрузок в базе: так file_id
+        переживают перезапуск бота.
+        """
+        if not video_id:
+            return None
+
+        key = self._cache_key(video_id, resolution)
+        file_id = self.file_id_cache.get(key)
+        if file_id is not None:
+            self.file_id_cache.move_to_end(key)
+            return file_id
+
+        file_id = find_file_id(video_id, resolution)
+        if file_id:
+            self._cache_file_id(key, file_id)
+        return file_id
+
+    def _cache_file_id(self, key: str, file_id: str):
+        self.file_id_cache[key] = file_id
+        self.file_id_cache.move_to_end(key)
+        while len(self.file_id_cache) > FILE_ID_CACHE_SIZE:
+            self.file_id_cache.popitem(last=False)
+
+    def remember_file_id(
+        self,
+        video_id: Optional[str],
+        resolution: str,
+        file_id: str,
+        download_id: Optional[int] = None,
+    ):
+        """Запомнить file_id отправленного видео (и в записи истории download_id)"""
+        if video_id and file_id:
+            self._cache_file_id(self._cache_key(video_id, resolution), file_id)
+        if download_id and file_id:
+            set_download_file_id(download_id, file_id)
+
+    def prefetch(
+        self,
+        url: str,
+        resolution: str,
+        publish: Callable[[str], Awaitable[str]],
+        lane: str = "normal",
+    ) -> asyncio.Task:
+        """Запустить фоновую загрузку видео и получить его file_id.
+
+        publish загружает скачанный файл в Telegram и возвращает file_id.
+        Повторный вызов для того же видео возвращает уже запущенную задачу.
+        """
+        video_id = extract_video_id(url)
+        key = self._cache_key(video_id or url, resolution)
+
+        task = self.prefetch_tasks.get(key)
+        if task:
+            return task
+
+        task = asyncio.create_task(
+            self._prefetch(url, video_id, resolution, publish, lane)
+        )
+        self.prefetch_tasks[key] = task
+        task.add_done_callback(lambda t: self._on_prefetch_done(key, t))
+        return task
+
+    async def _prefetch(
+        self,
+        url: str,
+        video_id: Optional[str],
+        resolution: str,
+        publish: Callable[[str], Awaitable[str]],
+        lane: str,
+    ) -> str:
+        video_path = await self._background_download(lane, url, resolution)
+        try:
+            file_id = await publish(video_path)
+        finally:
+            self.cleanup(video_path)
+
+        self.remember_file_id(video_id, resolution, file_id)
+        return file_id
+
+    async def download_to_cache(self, url: str, resolution: str) -> str:
+        """Скачать файл в медиа-кэш в фоне, без пользователя (полоса low)"""
+        return await self._background_download("low", url, resolution)
+
+    async def _background_download(self, lane: str, url: str, resolution: str) -> str:
+        """Скачивание без пользователя, которое останавливает stop_background"""
+        cancel_event = threading.Event()
+        self.background_cancels.add(cancel_event)
+        try:
+            return await self._scheduled_download(
+                lane, url, 0, resolution, cancel_event
+            )
+        except asyncio.CancelledError:
+            # Результат больше никто не ждёт: останавливаем и поток yt-dlp
+            cancel_event.set()
+            raise
+        finally:
+            self.background_cancels.discard(cancel_event)
+
+    def _on_prefetch_done(self, key: str, task: asyncio.Task):
+        self.prefetch_tasks.pop(key, None)
+        if not task.cancelled() and task.exception():
+            logger.error("Фоновая загрузка %s не удалась: %s", key, task.exception())
+
     def _get_ydl_opts(self, output_path: str = None, format_string: str = "best"):
         """Получить базовые настройки yt-dlp с максимальной совместимостью"""
         opts = {
-            "quiet": False,
+            # Весь вывод yt-dlp идёт в logging, а не в stdout
+            "quiet": True,
+            "noprogress": True,
             "no_warnings": False,
+            "logger": YtDlpLogger(),
             "format": format_string,
             "geo_bypass": True,
             "nocheckcertificate": True,
+            # Зависшее соединение с CDN обрывается внутри потока yt-dlp
+            "socket_timeout": YTDLP_SOCKET_TIMEOUT,
         }
 
         if output_path:
             opts["outtmpl"] = output_path
             opts["merge_output_format"] = "mp4"
 
-        # Добавляем cookies если есть
-        if self.cookies_path.exists():
-            opts["cookiefile"] = str(self.cookies_path.absolute())
-            print(f"✅ Используем cookies из: {self.cookies_path}")
-
         return opts
 
+    async def _call_ytdlp(
+        self,
+        source: Source,
+        opts: dict,
+        call: Callable[["yt_dlp.YoutubeDL"], Any],
+        timeout: Optional[float] = None,
+        abort: Optional[threading.Event] = None,
+    ) -> Any:
+        """Выполнить call(ydl) в потоке через выключатель площадки.
+
+        Экстракторы — только площадки source. Cookies и исходящий адрес
+        берутся у первого набора, чей выключатель замкнут; если разомкнуты
+        все — сразу YouTubeUnavailableError.
+        Поток нельзя убить: по истечении timeout или при отмене выставляется
+        abort, и хуки прогресса останавливают yt-dlp при следующем вызове.
+        """
+        import yt_dlp
+
+        identity = self.identities[source.name].acquire()
+        opts = {**opts, **source.ydl_opts, **identity.ydl_opts}
+
+        def run():
+            # YoutubeDL создаётся и закрывается в том же потоке: по таймауту
+            # поток ещё работает, и закрывать объект под ним нельзя
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                return call(ydl)
+
+        deadline = asyncio.timeout(timeout)
+        try:
+            async with deadline:
+                result = await asyncio.to_thread(run)
+        except TimeoutError as e:
+            # TimeoutError (socket_timeout) мог прийти и из самого yt-dlp
+            if not deadline.expired():
+                self._record_error(source, identity, e)
+                raise
+            if abort:
+                abort.set()
+            YTDLP_ERRORS.inc(source=source.name, error="timeout")
+            identity.breaker.record("timeout")
+            raise TimeoutError(f"Превышено время ожидания ({timeout:.0f} с)") from None
+        except asyncio.CancelledError as e:
+            # Иначе поток доработает до конца и задержит остановку бота
+            if abort:
+                abort.set()
+            self._record_error(source, identity, e)
+            raise
+        except BaseException as e:
+            self._record_error(source, identity, e)
+            raise
+
+        identity.breaker.record("ok")
+        return result
+
+    @staticmethod
+    def _record_error(source: Source, identity: Identity, error: BaseException):
+        outcome = classify_error(error)
+        YTDLP_ERRORS.inc(source=source.name, error=outcome)
+        identity.breaker.record(outcome)
+
+    def start_speculative_download(self, user_id: int, resolution: str):
+        """Начать скачивание разрешения до того, как пользователь его выбрал"""
+        video_info = self.video_cache.get(user_id)
+        if not video_info:
+            return
+
+        self.cancel_speculative_download(user_id)
+
+        # Лимит параллельных предзагрузок: лишние просто не запускаем
+        if self.closing or self.prefetch_semaphore.locked():
+            return
+
+        cancel_event = threading.Event()
+        task = asyncio.create_task(
+            self._speculative_download(
+                video_info.url, user_id, resolution, cancel_event
+            )
+        )
+        self.speculative_downloads[user_id] = SpeculativeDownload(
+            resolution=resolution, task=task, cancel_event=cancel_event
+        )
+        logger.info("Предзагрузка %sp для пользователя %s", resolution, user_id)
+
+    async def _speculative_download(
+        self,
+        url: str,
+        user_id: int,
+        resolution: str,
+        cancel_event: threading.Event,
+    ) -> str:
+        from yt_dlp.utils import DownloadCancelled
+
+        async with self.prefetch_semaphore:
+            if cancel_event.is_set():
+                raise DownloadCancelled()
+            # Догадка может не сбыться — не отнимаем слоты у настоящих запросов
+            return await self._scheduled_download(
+                "low", url, user_id, resolution, cancel_event
+            )
+
+    def cancel_speculative_download(self, user_id: int):
+        """Отменить предзагрузку и удалить её файл"""
+        speculative = self.speculative_downloads.pop(user_id, None)
+        if not speculative:
+            return
+
+        # Поток yt-dlp нельзя прервать снаружи: просим его остановиться через хук,
+        # а уже скачанный файл удаляем, когда задача завершится
+        speculative.cancel_event.set()
+        speculative.task.add_done_callback(self._discard_speculative_result)
+        logger.info("Предзагрузка %sp для %s отменена", speculative.resolution, user_id)
+
+    def _discard_speculative_result(self, task: asyncio.Task):
+        if not task.cancelled() and not task.exception():
+            self.cleanup(task.result())
+
+    async def _take_speculative_download(
+        self, user_id: int, resolution: str
+    ) -> Optional[str]:
+        """Забрать файл предзагрузки, если угадали разрешение"""
+        speculative = self.speculative_downloads.get(user_id)
+        if not speculative:
+            return None
+
+        cache_lookup("speculative", speculative.resolution == resolution)
+        if speculative.resolution != resolution:
+            self.cancel_speculative_download(user_id)
+            return None
+
+        del self.speculative_downloads[user_id]
+        try:
+            video_path = await speculative.task
+            logger.info("Предзагрузка %sp пригодилась", resolution)
+            return video_path
+        except asyncio.CancelledError:
+            # Пользователь отменил загрузку — останавливаем и поток yt-dlp
+            speculative.cancel_event.set()
+            raise
+        except Exception as e:
+            logger.warning("Предзагрузка не удалась, скачиваем заново: %s", e)
+            return None
+
+    def cached_video_info(self, url: str) -> Optional[VideoInfo]:
+        """Информация о видео из общего кэша (её мог заготовить CacheWarmer)"""
+        video_id = extract_video_id(url)
+        entry = self.info_cache.get(video_id) if video_id else None
+        if not entry:
+            return None
+
+        expires_at, video_info = entry
+        if time.monotonic() > expires_at:
+            del self.info_cache[video_id]
+            return None
+
+        self.info_cache.move_to_end(video_id)
+        # У пользователя своя ссылка (с ?si= и т.п.) — её и показываем
+        return replace(video_info, url=url)
+
+    def remember_video_info(self, video_info: VideoInfo):
+        """Положить информацию в общий кэш, вытесняя самые старые записи"""
+        if not video_info.video_id:
+            return
+
+        self.info_cache[video_info.video_id] = (
+            time.monotonic() + INFO_CACHE_SECONDS,
+            video_info,
+        )
+        self.info_cache.move_to_end(video_info.video_id)
+        while len(self.info_cache) > INFO_CACHE_SIZE:
+            self.info_cache.popitem(last=False)
+
+    async def load_video_info(
+        self, url: str, source: Optional[Source] = None
+    ) -> VideoInfo:
+        """Получить информацию о видео через yt-dlp и положить в общий кэш"""
+        source = source or find_source(url)
+        if not source:
+            raise Exception(UNSUPPORTED_LINK_ERROR)
+
+        ydl_opts = self._get_ydl_opts()
+
+        logger.info("Получаем информацию о видео: %s", url)
+
+        with span("extract_info", url=url):
+            info = await self._call_ytdlp(
+                source,
+                ydl_opts,
+                lambda ydl: ydl.extract_info(url, download=False),
+                timeout=EXTRACT_TIMEOUT,
+            )
+
+        video_info = make_video_info(url, info)
+        self.remember_video_info(video_info)
+        return video_info
+
     async def get_video_info(self, url: str, user_id: int) -> DownloadResult:
         """Получить информацию о видео и доступные разрешения"""
         if self.is_user_downloading(user_id):
@@ -74,54 +694,34 @@ class YouTubeDownloader:
                 success=False, error="Вы уже обрабатываете видео. Дождитесь завершения."
             )
 
+        source = find_source(url)
+        if not source:
+            return DownloadResult(success=False, error=UNSUPPORTED_LINK_ERROR)
+
         self.active_downloads[user_id] = True
+        self.cancel_speculative_download(user_id)
+        started = time.perf_counter()
+        status = "error"
 
         try:
-            ydl_opts = self._get_ydl_opts()
-            ydl_opts["quiet"] = True
-
-            print(f"🔍 Получаем информацию о видео: {url}")
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await asyncio.to_thread(ydl.extract_info, url, download=False)
-
-            # Получаем доступные разрешения
-            formats = info.get("formats", [])
-            resolutions = set()
-
-            for fmt in formats:
-                height = fmt.get("height")
-                if height:
-                    resolutions.add(height)
-
-            available_resolutions = sorted(list(resolutions))
-            print(f"✅ Доступные разрешения: {available_resolutions}")
-
-            # Фильтруем стандартные разрешения
-            standard_resolutions = ["480", "720"]
-            display_resolutions = [
-                res
-                for res in standard_resolutions
-                if any(int(res) <= ar for ar in available_resolutions)
-            ]
-
-            if not display_resolutions:
-                display_resolutions = ["360", "480", "720"]
-
-            video_info = VideoInfo(
-                url=url,
-                title=info.get("title", "Без названия"),
-                thumbnail=info.get("thumbnail", ""),
-                duration=info.get("duration", 0),
-                available_resolutions=display_resolutions,
-            )
+            video_info = self.cached_video_info(url)
+            cache_lookup("video_info", bool(video_info))
+            if video_info:
+                status = "cached"
+            else:
+                video_info = await self.load_video_info(url, source)
+                status = "ok"
 
             self.video_cache[user_id] = video_info
             return DownloadResult(success=True, video_info=video_info)
 
+        except YouTubeUnavailableError as e:
+            status = "breaker_open"
+            return DownloadResult(success=False, error=str(e))
+
         except Exception as e:
             error_text = str(e)
-            print(f"❌ Ошибка получения информации: {error_text}")
+            logger.error("Ошибка получения информации: %s", error_text)
 
             # Упрощенное сообщение об ошибке
             if "403" in error_text or "Forbidden" in error_text:
@@ -137,11 +737,18 @@ class YouTubeDownloader:
 
         finally:
             self.active_downloads[user_id] = False
+            VIDEO_INFO_SECONDS.observe(time.perf_counter() - started, status=status)
 
     async def download_video_by_resolution(
-        self, user_id: int, resolution: str
+        self,
+        user_id: int,
+        resolution: str,
+        progress: Optional[ProgressChannel] = None,
     ) -> DownloadResult:
-        """Скачать видео в определенном разрешении"""
+        """Скачать видео в определенном разрешении
+
+        Прогресс скачивания публикуется в progress, если он передан.
+        """
         if self.is_user_downloading(user_id):
             return DownloadResult(
                 success=False, error="Вы уже загружаете видео. Дождитесь завершения."
@@ -154,22 +761,108 @@ class YouTubeDownloader:
                 error="Информация о видео не найдена. Отправьте ссылку заново.",
             )
 
+        # Видео уже отправлялось — повторно не скачиваем
+        file_id = self.get_cached_file_id(video_info.video_id, resolution)
+        cache_lookup("file_id", bool(file_id))
+        if file_id:
+            self.cancel_speculative_download(user_id)
+            add_download_stat(
+                user_id,
+                video_info.url,
+                resolution,
+                video_id=video_info.video_id,
+                title=video_info.title,
+                file_id=file_id,
+            )
+            return DownloadResult(success=True, file_id=file_id, video_info=video_info)
+
         self.active_downloads[user_id] = True
+        if progress:
+            self.progress_channels[user_id] = progress
+
+        cancel_event = threading.Event()
+        task = asyncio.create_task(
+            self._fetch_video(user_id, video_info, resolution, cancel_event)
+        )
+        self.user_downloads[user_id] = UserDownload(
+            task=task, cancel_event=cancel_event
+        )
 
         try:
-            video_path = await self._download_video(video_info.url, user_id, resolution)
-            add_download_stat(user_id, video_info.url)
-            return DownloadResult(success=True, video_path=video_path)
+            try:
+                video_path = await task
+            except asyncio.CancelledError:
+                # Отменили сам хендлер (остановка бота), а не загрузку кнопкой
+                if asyncio.current_task().cancelling():
+                    raise
+                logger.info("Пользователь %s отменил загрузку", user_id)
+                return DownloadResult(success=False, error="Загрузка отменена")
+
+            # file_id допишется в запись после отправки (remember_file_id)
+            with span("db_write"):
+                download_id = add_download_stat(
+                    user_id,
+                    video_info.url,
+                    resolution,
+                    video_id=video_info.video_id,
+                    title=video_info.title,
+                )
+            return DownloadResult(
+                success=True,
+                video_path=video_path,
+                video_info=video_info,
+                download_id=download_id,
+            )
+
+        except YouTubeUnavailableError as e:
+            return DownloadResult(success=False, error=str(e))
 
         except Exception as e:
             error_text = str(e)
-            print(f"❌ Ошибка скачивания: {error_text}")
+            logger.error("Ошибка скачивания: %s", error_text)
             return DownloadResult(
                 success=False, error=f"Не удалось скачать: {error_text[:100]}"
             )
 
         finally:
+            if not task.done():
+                # Хендлер отменён (например, при остановке) — останавливаем поток
+                cancel_event.set()
+                task.cancel()
+            self.user_downloads.pop(user_id, None)
             self.active_downloads[user_id] = False
+            self.progress_channels.pop(user_id, None)
+
+    async def _fetch_video(
+        self,
+        user_id: int,
+        video_info: VideoInfo,
+        resolution: str,
+        cancel_event: threading.Event,
+    ) -> str:
+        """Взять файл предзагрузки или скачать видео через очередь"""
+        video_path = await self._take_speculative_download(user_id, resolution)
+        if video_path:
+            return video_path
+
+        lane = self.choose_lane(user_id, video_info, resolution)
+        return await self._scheduled_download(
+            lane, video_info.url, user_id, resolution, cancel_event
+        )
+
+    def cancel_user_download(self, user_id: int) -> bool:
+        """Отменить скачивание по кнопке; False, если отменять нечего.
+
+        Пользователь освобождается сразу, а поток yt-dlp останавливается
+        хуком прогресса и удаляет недокачанный файл сам.
+        """
+        download = self.user_downloads.pop(user_id, None)
+        if not download:
+            return False
+
+        download.cancel_event.set()
+        download.task.cancel()
+        return True
 
     async def download_and_process(self, url: str, user_id: int) -> DownloadResult:
         """Старый метод для обратной совместимости"""
@@ -192,36 +885,69 @@ class YouTubeDownloader:
             self.active_downloads[user_id] = False
 
     async def _download_video(
-        self, url: str, user_id: int, resolution: Optional[str] = None
+        self,
+        url: str,
+        user_id: int,
+        resolution: Optional[str] = None,
+        cancel_event: Optional[threading.Event] = None,
     ) -> str:
-        """Скачать видео - версия с выбором format_id"""
-        output_path = self.download_dir / f"{user_id}_{uuid.uuid4().hex[:8]}.mp4"
-
-        print(f"\n{'=' * 60}")
-        print(f"🎬 НАЧИНАЕМ СКАЧИВАНИЕ")
-        print(f"{'=' * 60}")
-        print(f"📹 URL: {url}")
-        print(
-            f"🎯 Запрошенное разрешение: {resolution}p"
-            if resolution
-            else "🎯 Лучшее качество"
-        )
+        """Скачать видео - версия с выбором format_id
+
+        Вместо разрешения можно передать AUDIO_MODE или ANIMATION_MODE.
+        cancel_event позволяет прервать скачивание из другого потока.
+        Файлы видео с известным ID складываются в медиа-кэш и не удаляются
+        после отправки.
+        """
+        from yt_dlp.utils import DownloadCancelled
+
+        if resolution == ANIMATION_MODE:
+            return await self._make_animation(url, user_id, cancel_event)
+
+        source = find_source(url)
+        if not source:
+            raise Exception(UNSUPPORTED_LINK_ERROR)
+
+        video_id = extract_video_id(url)
+        cache_key = None
+
+        if video_id:
+            cache_key = MediaCache.make_key(video_id, resolution or "best")
+            cached_path = self.media_cache.get(cache_key)
+            cache_lookup("media", bool(cached_path))
+            if cached_path:
+                logger.info("Видео взято из медиа-кэша: %s", cached_path)
+                return cached_path
+            output_path = self.media_cache.temp_path(cache_key)
+        else:
+            output_path = self.download_dir / f"{user_id}_{uuid.uuid4().hex[:8]}.mp4"
+
+        logger.info("Начинаем скачивание %s (%s)", url, format_label(resolution))
+
+        started = time.perf_counter()
 
         try:
             # Получаем информацию о видео
             info_opts = self._get_ydl_opts()
-            info_opts["quiet"] = True
 
-            with yt_dlp.YoutubeDL(info_opts) as ydl:
-                info = await asyncio.to_thread(ydl.extract_info, url, download=False)
+            with span("extract_info", url=url):
+                info = await self._call_ytdlp(
+                    source,
+                    info_opts,
+                    lambda ydl: ydl.extract_info(url, download=False),
+                    timeout=EXTRACT_TIMEOUT,
+                )
+
+            format_started = time.perf_counter()
 
             # Анализируем форматы и выбираем подходящий
             formats = info.get("formats", [])
 
             selected_format_id = None
             selected_height = None
+            # Выбранный формат без звука: yt-dlp склеит его с отдельной дорожкой
+            needs_merge = False
 
-            if resolution and formats:
+            if resolution and resolution != AUDIO_MODE and formats:
                 target_height = int(resolution)
 
                 # Ищем форматы с видео и аудио
@@ -241,85 +967,278 @@ class YouTubeDownloader:
                                 "id": format_id,
                                 "height": height,
                                 "has_audio": acodec != "none",
+                                # H.264 в mp4 склеивается с AAC простым копированием
+                                "mp4": fmt.get("ext") == "mp4"
+                                or str(vcodec).startswith("avc1"),
                                 "diff": diff,
                             }
                         )
 
-                # Сортируем: сначала по близости к целевому разрешению, потом по наличию аудио
-                suitable_formats.sort(key=lambda x: (x["diff"], not x["has_audio"]))
+                # Сортируем: по близости к целевому разрешению, по наличию аудио
+                # (тогда склейка не нужна вовсе), потом по совместимости с mp4
+                suitable_formats.sort(
+                    key=lambda x: (x["diff"], not x["has_audio"], not x["mp4"])
+                )
 
                 if suitable_formats:
                     best = suitable_formats[0]
                     selected_format_id = best["id"]
                     selected_height = best["height"]
+                    needs_merge = not best["has_audio"]
 
-                    print(
-                        f"✅ Выбран формат: {selected_format_id} ({selected_height}p)"
-                    )
-                    print(
-                        f"   Имеет аудио: {'Да' if best['has_audio'] else 'Нет (будет добавлен)'}"
+                    logger.info(
+                        "Выбран формат: %s (%sp), аудио: %s",
+                        selected_format_id,
+                        selected_height,
+                        "есть" if best["has_audio"] else "будет добавлено",
                     )
 
             # Формируем строку формата
-            if selected_format_id:
+            if resolution == AUDIO_MODE:
+                format_string = AUDIO_FORMAT
+            elif selected_format_id:
                 if resolution:
                     # Выбираем конкретный format_id + лучший аудио если нужно
+                    variants = [f"{selected_format_id}+{audio}" for audio in MP4_AUDIO]
+                    format_string = "/".join(variants + [selected_format_id, "best"])
+                else:
                     format_string = (
-                        f"{selected_format_id}+bestaudio/{selected_format_id}/best"
+                        "bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best"
                     )
-                else:
-                    format_string = "bestvideo+bestaudio/best"
             else:
                 format_string = "best"
 
-            print(f"📥 Итоговый формат: {format_string}")
-            print(f"💾 Выходной файл: {output_path}")
-            print(f"{'=' * 60}\n")
+            log_span(
+                "format_selection",
+                time.perf_counter() - format_started,
+                format=format_string,
+            )
+            logger.debug("Выходной файл: %s", output_path)
 
             # Скачиваем с выбранным форматом
-            download_opts = self._get_ydl_opts(str(output_path), format_string)
+            download_path = output_path
+            if resolution == AUDIO_MODE:
+                # Расширение исходника подставит yt-dlp; после извлечения звука
+                # файл всегда .m4a, его переносим в output_path
+                download_path = Path(output_path).with_suffix(".%(ext)s")
+            download_opts = self._get_ydl_opts(str(download_path), format_string)
+            if resolution == AUDIO_MODE:
+                download_opts["format_sort"] = AUDIO_FORMAT_SORT
+                download_opts["postprocessors"] = [
+                    {"key": "FFmpegExtractAudio", "preferredcodec": "m4a"}
+                ]
+
+            on_progress, on_postprocess = make_progress_hooks(
+                lambda event: self._publish_progress(user_id, event)
+            )
+            download_opts["progress_hooks"] = [on_progress]
+            download_opts["postprocessor_hooks"] = [
+                on_postprocess,
+                self._make_merge_timer(),
+            ]
+            # Склейка ffmpeg — самая дорогая по CPU часть задачи: один проход с
+            # копированием потоков (faststart yt-dlp добавляет сам). Fixup-проходы
+            # при склейке не нужны: она и так пересобирает контейнер. Без склейки
+            # они обязательны: FixupM3u8 переупаковывает HLS из MPEG-TS в mp4
+            if needs_merge:
+                download_opts["fixup"] = "never"
+
+            # Через этот флаг скачивание прерывают отмена и таймаут
+            cancel_event = cancel_event or threading.Event()
+            if cancel_event.is_set():
+                raise DownloadCancelled()
+
+            def check_cancelled(_):
+                if cancel_event.is_set():
+                    raise DownloadCancelled()
+
+            download_opts["progress_hooks"].append(check_cancelled)
+            download_opts["postprocessor_hooks"].append(check_cancelled)
+
+            # В замер download входит и merge, он дополнительно пишется отдельно
+            with span("download", format=format_string):
+                await self._call_ytdlp(
+                    source,
+                    download_opts,
+                    lambda ydl: ydl.download([url]),
+                    timeout=DOWNLOAD_TIMEOUT,
+                    abort=cancel_event,
+                )
 
-            with yt_dlp.YoutubeDL(download_opts) as ydl:
-                print(f"⬇️ Скачиваем...")
-                await asyncio.to_thread(ydl.download, [url])
+            if resolution == AUDIO_MODE:
+                extracted = Path(output_path).with_suffix(".m4a")
+                if os.path.exists(extracted):
+                    os.replace(extracted, output_path)
 
             if not os.path.exists(output_path):
                 raise Exception("Файл не был создан после скачивания")
 
-            file_size = os.path.getsize(output_path) / (1024 * 1024)
-            print(f"\n✅ УСПЕШНО СКАЧАНО!")
-            print(f"📦 Размер: {file_size:.2f} MB")
-
-            if selected_height:
-                print(
-                    f"🎯 Фактическое разрешение: {selected_height}p (запрошено: {resolution}p)"
-                )
+            size_bytes = os.path.getsize(output_path)
+            DOWNLOADED_BYTES.inc(size_bytes)
+            DOWNLOAD_SECONDS.observe(time.perf_counter() - started, status="ok")
 
-            print(f"📁 Файл: {output_path}\n")
+            file_size = size_bytes / (1024 * 1024)
+            logger.info(
+                "Скачано: %.2f MB, разрешение %sp (запрошено: %s)",
+                file_size,
+                selected_height or "?",
+                format_label(resolution),
+            )
 
         except Exception as e:
             error_text = str(e)
-            print(f"\n❌ ОШИБКА ПРИ СКАЧИВАНИИ:")
-            print(f"{error_text}\n")
-
-            if os.path.exists(output_path):
-                os.remove(output_path)
-
+            logger.error("Ошибка при скачивании: %s", error_text)
+            DOWNLOAD_SECONDS.observe(time.perf_counter() - started, status="error")
+
+            for leftover in (
+                output_path,
+                Path(f"{output_path}.part"),
+                Path(output_path).with_suffix(".m4a"),
+            ):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+            if isinstance(e, YouTubeUnavailableError):
+                raise
             raise Exception(f"Не удалось скачать видео: {error_text[:150]}")
 
+        if cache_key:
+            return self.media_cache.put(cache_key, output_path)
+
         return str(output_path)
 
+    async def _make_animation(
+        self,
+        url: str,
+        user_id: int,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> str:
+        """GIF-анимация (mp4 без звука) из исходного видео в медиа-кэше.
+
+        Исходник — любое уже скачанное разрешение этого видео, иначе 480p.
+        Анимация кэшируется под тем же ID видео, что и исходник.
+        """
+        from yt_dlp.utils import DownloadCancelled
+
+        video_id = extract_video_id(url)
+        if not video_id:
+            raise Exception("Не удалось определить ID видео")
+
+        cache_key = MediaCache.make_key(video_id, ANIMATION_MODE)
+        cached_path = self.media_cache.get(cache_key)
+        cache_lookup("media", bool(cached_path))
+        if cached_path:
+            return cached_path
+
+        source_path = None
+        for source_resolution in ("480", "360", "720", "best"):
+            source_path = self.media_cache.get(
+                MediaCache.make_key(video_id, source_resolution)
+            )
+            if source_path:
+                break
+        if not source_path:
+            source_path = await self._download_video(url, user_id, "480", cancel_event)
+
+        output_path = self.media_cache.temp_path(cache_key)
+        command = [
+            FFMPEG_PATH,
+            "-y",
+            "-v",
+            "error",
+            "-t",
+            str(ANIMATION_MAX_SECONDS),
+            "-i",
+            source_path,
+            "-an",
+            "-vf",
+            f"fps={ANIMATION_FPS},scale=-2:'min({ANIMATION_HEIGHT},ih)'",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-crf",
+            "28",
+            "-pix_fmt",
+            "yuv420p",
+            "-movflags",
+            "+faststart",
+            str(output_path),
+        ]
+
+        # ffmpeg — отдельный процесс: при отмене и по таймауту его просто убиваем
+        deadline = time.monotonic() + DOWNLOAD_TIMEOUT
+        with span("animation", video_id=video_id):
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            communicate = asyncio.ensure_future(process.communicate())
+            try:
+                while not communicate.done():
+                    if cancel_event and cancel_event.is_set():
+                        raise DownloadCancelled()
+                    if time.monotonic() > deadline:
+                        raise TimeoutError("Превышено время создания GIF")
+                    await asyncio.wait({communicate}, timeout=0.5)
+                _, stderr = communicate.result()
+            except BaseException:
+                if process.returncode is None:
+                    process.kill()
+                await asyncio.wait({communicate})
+                output_path.unlink(missing_ok=True)
+                raise
+
+        if process.returncode != 0:
+            output_path.unlink(missing_ok=True)
+            error_text = stderr.decode(errors="replace").strip()
+            raise Exception(f"Не удалось создать GIF: {error_text[-150:]}")
+
+        return self.media_cache.put(cache_key, output_path)
+
+    @staticmethod
+    def _make_merge_timer():
+        """postprocessor_hook, замеряющий склейку видео и звука через ffmpeg"""
+        started = {}
+
+        def on_postprocess(d):
+            if d.get("postprocessor") != "Merger":
+                return
+            if d.get("status") == "started":
+                started["at"] = time.perf_counter()
+            elif d.get("status") == "finished" and "at" in started:
+                duration = time.perf_counter() - started.pop("at")
+                MERGE_SECONDS.observe(duration)
+                log_span("merge", duration)
+
+        return on_postprocess
+
     def cleanup(self, video_path: str):
-        """Удалить временный файл"""
+        """Удалить временный файл (файлы медиа-кэша остаются)"""
+        if video_path and self.media_cache.contains_path(video_path):
+            return
+
         if video_path and os.path.exists(video_path):
             try:
                 os.remove(video_path)
-                print(f"🗑️ Удален временный файл: {video_path}")
+                logger.debug("Удален временный файл: %s", video_path)
             except Exception as e:
-                print(f"⚠️ Не удалось удалить файл: {e}")
+                logger.warning("Не удалось удалить файл: %s", e)
+
+    async def stop_background(self):
+        """Остановить фоновые загрузки: при остановке бота их никто не ждёт"""
+        self.closing = True
+        for user_id in list(self.speculative_downloads):
+            self.cancel_speculative_download(user_id)
+        for task in list(self.prefetch_tasks.values()):
+            task.cancel()
+        for cancel_event in list(self.background_cancels):
+            cancel_event.set()
 
     def clear_cache(self, user_id: int):
         """Очистить кэш пользователя"""
+        self.cancel_speculative_download(user_id)
         if user_id in self.video_cache:
             del self.video_cache[user_id]
-            print(f"🧹 Очищен кэш для пользователя {user_id}")
+            logger.debug("Очищен кэш для пользователя %s", user_id)
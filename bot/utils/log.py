@@ -0,0 +1,79 @@
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+from bot.utils.tracing import get_correlation_id
+
+
+class CorrelationIdFilter(logging.Filter):
+    """Добавляет в запись ID запроса, пока мы ещё в потоке/контексте вызова"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = get_correlation_id()
+        return True
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Формат key=value: легко читать глазами и разбирать grep/jq/Loki"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [
+            f"ts={self.formatTime(record, '%Y-%m-%dT%H:%M:%S')}",
+            f"level={record.levelname}",
+            f"logger={record.name}",
+            f"cid={getattr(record, 'correlation_id', '-')}",
+        ]
+
+        for key, value in getattr(record, "fields", {}).items():
+            parts.append(f"{key}={value}")
+
+        parts.append(f"msg={record.getMessage()!r}")
+
+        if record.exc_info:
+            parts.append(f"exc={self.formatException(record.exc_info)!r}")
+
+        return " ".join(parts)
+
+
+def setup_logging(level: str = "INFO") -> QueueListener:
+    """Настроить логирование через очередь.
+
+    Хендлеры вызываются только в фоновом потоке QueueListener, поэтому
+    медленный терминал или pipe не блокирует event loop.
+    """
+    queue = SimpleQueue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(KeyValueFormatter())
+
+    queue_handler = QueueHandler(queue)
+    queue_handler.addFilter(CorrelationIdFilter())
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class YtDlpLogger:
+    """Перенаправляет вывод yt-dlp в logging вместо stdout"""
+
+    def __init__(self):
+        self.logger = logging.getLogger("yt_dlp")
+
+    def debug(self, msg: str):
+        # yt-dlp шлёт сюда и обычные сообщения, и отладку (с префиксом [debug])
+        self.logger.debug(msg)
+
+    def info(self, msg: str):
+        self.logger.debug(msg)
+
+    def warning(self, msg: str):
+        self.logger.warning(msg)
+
+    def error(self, msg: str):
+        self.logger.error(msg)
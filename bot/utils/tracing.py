@@ -0,0 +1,55 @@
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger("bot.timing")
+
+# ID запроса: связывает все логи и замеры одного апдейта. ContextVar
+# копируется в asyncio-задачи и asyncio.to_thread, так что доходит и до yt-dlp
+_correlation_id: ContextVar[str] = ContextVar("correlation_id", default="-")
+
+
+def get_correlation_id() -> str:
+    return _correlation_id.get()
+
+
+def set_correlation_id(value: Optional[str] = None) -> str:
+    value = value or uuid.uuid4().hex[:12]
+    _correlation_id.set(value)
+    return value
+
+
+def log_span(name: str, duration: float, status: str = "ok", **fields):
+    """Записать замер фазы, если время уже посчитано снаружи"""
+    logger.info(
+        "span",
+        extra={
+            "fields": {
+                "span": name,
+                "duration_ms": f"{duration * 1000:.1f}",
+                "status": status,
+                **fields,
+            }
+        },
+    )
+
+
+@contextmanager
+def span(name: str, **fields):
+    """Замерить фазу обработки запроса.
+
+    with span("extract_info", url=url):
+        ...
+    """
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield fields
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        log_span(name, time.perf_counter() - started, status, **fields)
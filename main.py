@@ -3,30 +3,114 @@ import logging
 
 from aiogram import Bot, Dispatcher
 
-from bot.config import BOT_TOKEN
+from bot.config import (
+    BOT_TOKEN,
+    DOWNLOAD_DIR,
+    LOG_LEVEL,
+    METRICS_HOST,
+    METRICS_PORT,
+)
 from bot.database.models import init_db
-from bot.handlers import admin, download, start
+from bot.handlers import admin, download, history, inline, start
+from bot.middlewares.backpressure import BackpressureMiddleware
+from bot.middlewares.correlation import CorrelationMiddleware
+from bot.middlewares.metrics import MetricsMiddleware
+from bot.middlewares.throttling import ThrottlingMiddleware
 from bot.middlewares.user_tracking import UserTrackingMiddleware
+from bot.services.backpressure import backpressure
+from bot.services.lifecycle import lifecycle
+from bot.services.metrics import start_metrics_server
+from bot.services.thumbnails import ThumbnailCache
+from bot.services.warmer import CacheWarmer
+from bot.services.youtube import YouTubeDownloader
+from bot.utils.log import setup_logging
 
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 
-async def main():
-    """Точка входа в приложение"""
+async def on_startup(dispatcher: Dispatcher, bot: Bot):
+    """Создать сервисы; хендлеры получают их из workflow data диспетчера"""
+    youtube_service = YouTubeDownloader(DOWNLOAD_DIR)
+    dispatcher["youtube_service"] = youtube_service
+    dispatcher["thumbnail_cache"] = ThumbnailCache()
 
-    init_db()
+    cache_warmer = CacheWarmer(youtube_service, bot)
+    cache_warmer.start()
+    dispatcher["cache_warmer"] = cache_warmer
 
-    bot = Bot(token=BOT_TOKEN)
+    backpressure.start(lambda: youtube_service.scheduler.queued)
+
+
+async def on_shutdown(dispatcher: Dispatcher):
+    """Сначала гасим фоновые загрузки, потом дожидаемся задач пользователей
+    и только затем закрываем ресурсы"""
+    await dispatcher["cache_warmer"].stop()
+    await backpressure.stop()
+    await dispatcher["youtube_service"].stop_background()
+    await lifecycle.drain()
+    await dispatcher["thumbnail_cache"].close()
+
+
+def create_dispatcher() -> Dispatcher:
+    """Собрать диспетчер со всеми middleware и роутерами"""
     dp = Dispatcher()
 
+    dp.update.outer_middleware(CorrelationMiddleware())
+    # Ограничение апдейтов в обработке: при перегрузке новые ждут или
+    # отбрасываются ещё до хендлеров и сообщения "⏳ Загрузка..."
+    dp.update.outer_middleware(BackpressureMiddleware(backpressure))
+
+    # Один экземпляр на все типы событий: общие лимиты пользователя.
+    # Стоит первым, чтобы флуд не доходил даже до записи в базу
+    throttling = ThrottlingMiddleware()
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+    dp.inline_query.middleware(throttling)
+
     dp.message.middleware(UserTrackingMiddleware())
 
+    for event_name in (
+        "message",
+        "callback_query",
+        "inline_query",
+        "chosen_inline_result",
+    ):
+        dp.observers[event_name].middleware(MetricsMiddleware(event_name))
+
+    # Работа, не завершённая прошлым процессом, продолжается после создания сервисов
+    dp.startup.register(on_startup)
+    dp.startup.register(lifecycle.resume_pending)
+    dp.shutdown.register(on_shutdown)
+
     dp.include_router(admin.router)  # Админ-команды (первые, т.к. с фильтром)
     dp.include_router(start.router)  # /start
     dp.include_router(download.router)  # Скачивание
+    dp.include_router(history.router)  # /history
+    dp.include_router(inline.router)  # Inline-режим
+
+    return dp
+
+
+async def main():
+    """Точка входа в приложение"""
+
+    log_listener = setup_logging(LOG_LEVEL)
+    init_db()
+
+    bot = Bot(token=BOT_TOKEN)
+    dp = create_dispatcher()
+
+    metrics_runner = None
+    if METRICS_PORT:
+        metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
 
-    print("🚀 Бот запущен!")
-    await dp.start_polling(bot)
+    logger.info("Бот запущен")
+    try:
+        await dp.start_polling(bot)
+    finally:
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        log_listener.stop()
 
 
 if __name__ == "__main__":